@@ -1,20 +1,57 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Literal
-from openai import OpenAI
-import os, json, re
+from fastapi.responses import StreamingResponse
+from typing import List, NamedTuple, Optional
+from openai import AsyncOpenAI
+import os
 import numpy as np
-from googleapiclient.discovery import build  # type: ignore
+import orjson
 from google.oauth2 import service_account  # type: ignore
 from dotenv import load_dotenv
 import asyncio
+import re
+import threading
+import time
 from datetime import datetime
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 
-from pdf_extractor import sync_pdfs
+from pdf_extractor import (
+    sync_pdfs, load_store, list_all_pdfs, read_doc_text, changes_token_file, VECTORS_FILE, META_FILE,
+    EMBEDDING_MODEL,
+)
+from helpers import (
+    extract_json_from_response, build_drive_service, build_drive_query, build_drive_query_extended, same_query,
+    is_newer, build_openai_http_client, load_encoding, truncate_tokens, quantize_int8,
+)
+from models import (
+    SearchFilters, DriveSearchRequest, DriveSearchResponse, HybridSearchRequest, HybridResult,
+    HybridSearchResponse, AskRequest, DocumentOutDrive, DocumentOutSemantic, AskResponse,
+)
+
+try:
+    import simsimd  # type: ignore
+except ImportError:  # fallback pe numpy/BLAS
+    simsimd = None
+
+try:
+    import faiss  # type: ignore
+except ImportError:
+    faiss = None
 
 # === Config FastAPI ===
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Indexul se încarcă la pornirea serverului, nu la import: matricea e memory-mapped,
+    deci mai mulți workeri uvicorn împart aceleași pagini din page cache-ul OS-ului.
+    """
+    await asyncio.to_thread(load_embeddings)
+    app.state.sync_task = asyncio.create_task(_periodic_sync(SYNC_INTERVAL))
+    yield
+    app.state.sync_task.cancel()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
@@ -28,168 +65,239 @@ load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     raise RuntimeError("OPENAI_API_KEY nu este setat.")
-client = OpenAI(api_key=api_key)
+aclient = AsyncOpenAI(api_key=api_key, http_client=build_openai_http_client())  # toate apelurile sunt await-uite, fără a bloca event loop-ul
+
+# === Structured outputs: OpenAI garantează JSON valid conform schemei ===
+def _json_schema_format(name: str, properties: dict) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+DRIVE_PLAN_FORMAT = _json_schema_format("drive_plan", {
+    "keywords": {"type": "array", "items": {"type": "string"}},
+    "date_after": {"type": ["string", "null"], "description": "YYYY-MM-DD"},
+    "date_before": {"type": ["string", "null"], "description": "YYYY-MM-DD"},
+    "order": {"type": "string", "enum": ["asc", "desc"]},
+    "answer": {"type": "string", "description": "Răspuns scurt pentru utilizator"},
+})
+REFINE_FORMAT = _json_schema_format("refined_query", {
+    "refined": {"type": "string"},
+})
 
 # === Config Google Drive ===
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
 creds = service_account.Credentials.from_service_account_file("service.json", scopes=SCOPES)
-drive_service = build("drive", "v3", credentials=creds)
+_drive_local = threading.local()
+
+def get_drive_service():
+    """Client Drive per thread: httplib2 nu e thread-safe, iar apelurile rulează în asyncio.to_thread."""
+    service = getattr(_drive_local, "service", None)
+    if service is None:
+        service = _drive_local.service = build_drive_service(creds)
+    return service
+
+def list_drive_files(**params) -> dict:
+    """files().list(...).execute() blocant; din cod async se apelează prin asyncio.to_thread."""
+    return get_drive_service().files().list(**params).execute()
+
+get_drive_service()  # construiește clientul thread-ului principal la pornire, ca înainte
+
+# === Cache semantic pentru răspunsuri ===
+# Prag cosinus query-query, conservator: query-uri care diferă printr-un detaliu
+# (o lună, un nume) au adesea similaritate peste 0.9
+QUERY_CACHE_THRESHOLD = float(os.getenv("QUERY_CACHE_THRESHOLD", "0.97"))
+
+class SemanticCache:
+    """Răspunsuri memorate după embedding-ul (normalizat) al query-ului.
+
+    Embedding-urile stau într-o singură matrice, deci o căutare e un singur
+    produs matrice-vector. `key` separă intrările care nu sunt interschimbabile
+    (ex. filtre diferite); la depășirea `max_size` se elimină intrarea folosită
+    cel mai demult. `generation` e generația indexului pe care s-a calculat
+    răspunsul: o generație nouă golește cache-ul, una veche nu mai e memorată.
+    Se folosește doar din event loop, deci fără lock-uri.
+    """
 
-# === Load embeddings ===
-docs = []
-EMBEDDINGS_FILE = "embeddings.json"
+    def __init__(self, ttl: float, max_size: int, threshold: float = QUERY_CACHE_THRESHOLD):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.threshold = threshold
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        self.emb = np.zeros((0, 0), dtype=np.float32)
+        self.entries: List[dict] = []
+
+    def _drop(self, keep: np.ndarray):
+        self.emb = self.emb[keep]
+        self.entries = [e for e, k in zip(self.entries, keep) if k]
+
+    def _bind(self, generation: int) -> bool:
+        if generation > self.generation:  # indexul a fost reîncărcat: răspunsurile memorate sunt vechi
+            self.clear()
+            self.generation = generation
+        return generation == self.generation
+
+    def lookup(self, q_norm: np.ndarray, generation: int, key=None):
+        if not self._bind(generation):
+            return None
+        now = time.time()
+        fresh = np.array([now - e["ts"] < self.ttl for e in self.entries], dtype=bool)
+        if not fresh.all():
+            self._drop(fresh)
+        if not self.entries:
+            return None
+
+        sims = self.emb @ q_norm
+        for i, e in enumerate(self.entries):
+            if e["key"] != key:
+                sims[i] = -1.0
+        best = int(np.argmax(sims))
+        if sims[best] >= self.threshold:
+            self.entries[best]["last_used"] = now
+            return self.entries[best]["response"]
+        return None
+
+    def store(self, q_norm: np.ndarray, response, generation: int, key=None):
+        if not self._bind(generation):
+            return
+        row = np.asarray(q_norm, dtype=np.float32)[None, :]
+        self.emb = row if not self.entries else np.vstack([self.emb, row])
+        now = time.time()
+        self.entries.append({"key": key, "ts": now, "last_used": now, "response": response})
+        if len(self.entries) > self.max_size:
+            keep = np.ones(len(self.entries), dtype=bool)
+            keep[min(range(len(self.entries)), key=lambda i: self.entries[i]["last_used"])] = False
+            self._drop(keep)
+
+ASK_CACHE = SemanticCache(ttl=3600, max_size=500)
+# Rezultatele Drive sunt live, deci cache-ul hibrid expiră mai repede
+HYBRID_CACHE = SemanticCache(ttl=300, max_size=500)
+
+def _normalize(v: np.ndarray) -> np.ndarray:
+    return v / (np.linalg.norm(v) + 1e-12)
 
-def load_embeddings():
-    global docs
+# === Load embeddings ===
+class SearchIndex(NamedTuple):
+    """Indexul încărcat; e înlocuit doar în bloc, printr-o singură atribuire a lui INDEX."""
+    docs: list
+    matrix: np.ndarray  # (N, D), rânduri L2-normalizate
+    i8_norms: Optional[np.ndarray]  # normele rândurilor cuantizate (doar int8)
+    faiss: object  # IndexFlatIP sau None
+    stamp: Optional[tuple]  # mtime-urile fișierelor la încărcare
+    generation: int  # crește la fiecare reîncărcare; cache-urile semantice se golesc după el
+
+INDEX = SearchIndex([], np.zeros((0, 0), dtype=np.float32), None, None, None, 0)
+# "float16" = formatul de pe disc, folosit direct prin mmap; "float32" = upcast la încărcare,
+# "int8" = vectori cuantizați (scală per rând) pentru scanare VNNI/SDOT, cel mai agresiv
+EMBEDDINGS_DTYPE = os.getenv("EMBEDDINGS_DTYPE", "float16")
+# "faiss" = IndexFlatIP (top-k SIMD în FAISS, copie float32 proprie); altfel SimSIMD/numpy pe INDEX.matrix
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "simsimd")
+
+def build_doc_matrix(matrix: np.ndarray) -> np.ndarray:
+    """
+    Pregătește matricea (N, D) pentru scanare: rânduri normalizate L2, în EMBEDDINGS_DTYPE.
+    Când tipul coincide cu cel de pe disc (float16), matricea memory-mapped e folosită direct.
+    """
+    if matrix.shape[0] == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    if matrix.dtype == np.int8 and EMBEDDINGS_DTYPE == "int8":
+        return np.asarray(matrix)  # deja cuantizat pe disc (VECTORS_DTYPE=int8), fără copie
+    norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix, dtype=np.float32))[:, None]
+    if not np.allclose(norms, 1.0, atol=1e-2):
+        matrix = matrix / norms.clip(min=1e-12)
+    if EMBEDDINGS_DTYPE == "int8":
+        return quantize_int8(matrix)[0]
+    if EMBEDDINGS_DTYPE == "float16":
+        return np.asarray(matrix, dtype=np.float16)
+    return np.asarray(matrix, dtype=np.float32)
+
+def drop_invalid_rows(meta: list, matrix: np.ndarray):
+    """Elimină la încărcare rândurile cu NaN/inf sau nule, ca scorarea să nu aibă cazuri de eroare."""
+    valid = np.isfinite(matrix).all(axis=1) & (matrix != 0).any(axis=1)
+    if valid.all():
+        return meta, matrix
+    print(f"⚠️ Ignor {int((~valid).sum())} documente cu embedding invalid")
+    return [item for item, ok in zip(meta, valid) if ok], matrix[valid]
+
+def build_faiss_index(matrix: np.ndarray):
+    """IndexFlatIP peste vectorii normalizați: produsul scalar = similaritatea cosinus."""
+    vectors = np.array(matrix, dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+def _store_stamp():
     try:
-        with open(EMBEDDINGS_FILE, "r", encoding="utf-8") as f:
-            docs = json.load(f)
-            print(f"✅ Încărcat {len(docs)} documente din {EMBEDDINGS_FILE}")
+        return (os.stat(VECTORS_FILE).st_mtime_ns, os.stat(META_FILE).st_mtime_ns)
     except FileNotFoundError:
-        docs = []
-        print("⚠️ embeddings.json nu a fost găsit.")
-
-load_embeddings()
-
-# === MIME Types Mapping ===
-MIME_TYPE_MAP = {
-    "pdf": "application/pdf",
-    "doc": "application/msword",
-    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    "xls": "application/vnd.ms-excel",
-    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    "ppt": "application/vnd.ms-powerpoint",
-    "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-    "txt": "text/plain",
-    "csv": "text/csv",
-    "zip": "application/zip",
-    "jpg": "image/jpeg",
-    "jpeg": "image/jpeg",
-    "png": "image/png"
-}
-
-# === Helper pentru parsare JSON robust ===
-def extract_json_from_response(content: str) -> dict:
-    """Extrage JSON dintr-un răspuns GPT care poate conține markdown sau text extra."""
-    if not content:
-        return {}
-    
-    content = content.strip()
-    
-    try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        pass
-    
-    if "```" in content:
-        match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group(1))
-            except json.JSONDecodeError:
-                pass
-    
-    match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', content, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
-    
-    start = content.find('{')
-    end = content.rfind('}')
-    if start != -1 and end != -1 and end > start:
-        try:
-            return json.loads(content[start:end+1])
-        except json.JSONDecodeError:
-            pass
-    
-    print(f"⚠️ Nu s-a putut parsa JSON din: {content[:200]}...")
-    return {}
-
-def escape_drive_query(text: str) -> str:
-    """Escape ghilimele simple pentru Drive API query."""
-    return text.replace("'", "\\'")
-
-def build_drive_query_extended(
-    query: str = "",
-    mime_types: List[str] = None,
-    date_after: Optional[str] = None,
-    date_before: Optional[str] = None,
-    folder_id: Optional[str] = None,
-    use_fulltext: bool = True
-) -> str:
+        return None
+
+def load_embeddings():
     """
-    Construiește query pentru Google Drive API cu filtre extinse.
-    
-    Args:
-        query: Textul căutării
-        mime_types: Lista de extensii (pdf, docx, etc.)
-        date_after: Data minimă (YYYY-MM-DD)
-        date_before: Data maximă (YYYY-MM-DD)
-        folder_id: ID-ul folderului (opțional)
-        use_fulltext: Dacă să includă fullText contains
+    (Re)încarcă indexul doar dacă fișierele s-au schimbat de la ultima încărcare.
+    Rulează într-un thread: noul index e construit complet și apoi publicat printr-o singură
+    atribuire, deci un request vede fie indexul vechi, fie pe cel nou, niciodată un amestec.
     """
-    conditions = ["trashed = false"]
-    
-    # Query text (name + fullText)
-    if query and query.strip():
-        escaped_query = escape_drive_query(query.strip())
-        if use_fulltext:
-            conditions.append(f"(name contains '{escaped_query}' or fullText contains '{escaped_query}')")
-        else:
-            conditions.append(f"name contains '{escaped_query}'")
-    
-    # MIME types
-    if mime_types and len(mime_types) > 0:
-        mime_conditions = []
-        for ext in mime_types:
-            mime = MIME_TYPE_MAP.get(ext.lower())
-            if mime:
-                mime_conditions.append(f"mimeType = '{mime}'")
-        
-        if mime_conditions:
-            conditions.append("(" + " or ".join(mime_conditions) + ")")
-    
-    # Date filters
-    if date_after:
-        conditions.append(f"modifiedTime >= '{date_after}T00:00:00Z'")
-    
-    if date_before:
-        conditions.append(f"modifiedTime <= '{date_before}T23:59:59Z'")
-    
-    # Folder
-    if folder_id:
-        conditions.append(f"'{folder_id}' in parents")
-    
-    q = " and ".join(conditions)
-    return q
+    global INDEX
+    current = INDEX
+    stamp = _store_stamp()
+    if stamp is not None and stamp == current.stamp:
+        return
+    try:
+        meta, matrix = drop_invalid_rows(*load_store(VECTORS_FILE, META_FILE,
+                                                     dequantize=EMBEDDINGS_DTYPE != "int8"))
+        new_matrix = build_doc_matrix(matrix)
+        i8_norms = np.linalg.norm(new_matrix.astype(np.float32), axis=1) if new_matrix.dtype == np.int8 else None
+        faiss_index = build_faiss_index(matrix) if SEARCH_BACKEND == "faiss" and faiss is not None and matrix.shape[0] else None
+        INDEX = SearchIndex(meta, new_matrix, i8_norms, faiss_index, _store_stamp(), current.generation + 1)
+        print(f"✅ Încărcat {len(meta)} documente din {META_FILE}")
+    except FileNotFoundError:
+        INDEX = SearchIndex([], np.zeros((0, 0), dtype=np.float32), None, None, None, current.generation + 1)
+        print(f"⚠️ {VECTORS_FILE} / {META_FILE} nu au fost găsite.")
+    except ValueError as e:  # fișiere nepotrivite (ex. citite în timpul unei scrieri): rămâne indexul curent
+        print(f"⚠️ Index invalid, păstrez versiunea încărcată: {e}")
 
 def check_drive_sync() -> dict:
-    """Verifică sincronizarea Drive cu embeddings.json"""
+    """Verifică sincronizarea Drive cu indexul local (embeddings.npy + meta.jsonl)"""
     load_embeddings()
+    if os.path.exists(changes_token_file(META_FILE)):
+        # Cu token salvat, sync_pdfs citește doar modificările (changes.list): fără listarea completă a Drive-ului
+        sync_result = sync_pdfs()
+        load_embeddings()
+        return sync_result
     try:
-        results = drive_service.files().list(
-            q="mimeType='application/pdf' and trashed = false",
-            fields="files(id, name, modifiedTime)",
-            pageSize=1000
-        ).execute()
+        drive_files = list_all_pdfs(get_drive_service, fields="nextPageToken, files(id, name, modifiedTime)")
         
-        drive_files = results.get("files", [])
-        drive_ids = {f["id"]: f for f in drive_files}
-        local_ids = {doc["id"]: doc for doc in docs}
+        drive_names = {f["id"]: f["name"] for f in drive_files}
+        drive_mtimes = {f["id"]: f.get("modifiedTime", "") for f in drive_files}
+        local_docs = INDEX.docs
+        local_names = {doc["id"]: doc["name"] for doc in local_docs}
+        local_mtimes = {doc["id"]: doc.get("modifiedTime", "") for doc in local_docs}
         
-        missing_in_local = set(drive_ids.keys()) - set(local_ids.keys())
-        extra_in_local = set(local_ids.keys()) - set(drive_ids.keys())
+        missing_in_local = drive_names.keys() - local_names.keys()
+        extra_in_local = local_names.keys() - drive_names.keys()
         
         modified = []
-        for file_id in set(drive_ids.keys()) & set(local_ids.keys()):
-            drive_modified = drive_ids[file_id].get("modifiedTime", "")
-            local_modified = local_ids[file_id].get("modifiedTime", "")
-            if drive_modified and local_modified and drive_modified > local_modified:
+        for file_id in drive_names.keys() & local_names.keys():
+            drive_modified = drive_mtimes[file_id]
+            local_modified = local_mtimes[file_id]
+            if drive_modified and local_modified and is_newer(drive_modified, local_modified):
                 modified.append({
                     "id": file_id,
-                    "name": drive_ids[file_id]["name"],
+                    "name": drive_names[file_id],
                     "drive_modified": drive_modified,
                     "local_modified": local_modified
                 })
@@ -198,14 +306,14 @@ def check_drive_sync() -> dict:
         
         result = {
             "is_synced": is_synced,
-            "drive_total": len(drive_ids),
-            "local_total": len(local_ids),
+            "drive_total": len(drive_names),
+            "local_total": len(local_names),
             "missing_in_local": len(missing_in_local),
             "extra_in_local": len(extra_in_local),
             "modified": len(modified),
             "details": {
-                "missing_files": [{"id": id, "name": drive_ids[id]["name"]} for id in list(missing_in_local)[:5]],
-                "extra_files": [{"id": id, "name": local_ids[id]["name"]} for id in list(extra_in_local)[:5]],
+                "missing_files": [{"id": id, "name": drive_names[id]} for id in list(missing_in_local)[:5]],
+                "extra_files": [{"id": id, "name": local_names[id]} for id in list(extra_in_local)[:5]],
                 "modified_files": modified[:5]
             }
         }
@@ -216,99 +324,133 @@ def check_drive_sync() -> dict:
             load_embeddings()
             return sync_result
         
-        print("✅ Drive și embeddings.json sunt sincronizate!")
+        print("✅ Drive și indexul local sunt sincronizate!")
         return result
         
     except Exception as e:
         print(f"❌ Eroare verificare sincronizare: {e}")
         return {"is_synced": None, "error": str(e)}
 
-# === Modele Pydantic ===
-class SearchFilters(BaseModel):
-    mime_types: Optional[List[str]] = None
-    date_after: Optional[str] = None
-    date_before: Optional[str] = None
-    folder_id: Optional[str] = None
-
-class DriveSearchRequest(BaseModel):
-    query: str
-    page_size: Optional[int] = 50
-    page_token: Optional[str] = None
-    filters: Optional[SearchFilters] = None
-
-class DriveSearchResponse(BaseModel):
-    files: List[dict]
-    nextPageToken: Optional[str] = None
-    query_used: str
-
-class HybridSearchRequest(BaseModel):
-    query: str
-    filters: Optional[SearchFilters] = None
-    top_n: Optional[int] = 10
-
-class HybridResult(BaseModel):
-    source: Literal["drive", "local"]
-    id: str
-    name: str
-    mimeType: Optional[str] = None
-    webViewLink: Optional[str] = None
-    modifiedTime: Optional[str] = None
-    size: Optional[int] = None
-    snippet: Optional[str] = None
-    score_semantic: Optional[float] = None
-    title_hit: Optional[bool] = None
-
-class HybridSearchResponse(BaseModel):
-    mode: str = "hybrid"
-    query: str
-    gpt_answer: str
-    results: List[HybridResult]
-    counts: dict
-    query_used: Optional[str] = None
-
-class AskRequest(BaseModel):
-    query: str
-    use_semantic_search: bool = False
-
-class DocumentOutDrive(BaseModel):
-    id: str
-    name: str
-    mimeType: str
-    webViewLink: str
-    webContentLink: Optional[str] = None
-    createdTime: Optional[str] = None
-
-class DocumentOutSemantic(BaseModel):
-    name: str
-    text: str
-    score: float
-
-class AskResponse(BaseModel):
-    gpt_answer: str
-    refined_query: Optional[str] = None
-    mode: str
-    files: Optional[List[DocumentOutDrive]] = None
-    results: Optional[List[DocumentOutSemantic]] = None
-    sync_status: Optional[dict] = None
+# === Sincronizare în fundal (în afara request-urilor) ===
+SYNC_INTERVAL = int(os.getenv("SYNC_INTERVAL", "600"))  # secunde
+last_sync_status: Optional[dict] = None
+_sync_lock = asyncio.Lock()
+
+async def run_drive_sync() -> dict:
+    """Rulează check_drive_sync într-un thread; un singur sync la un moment dat."""
+    global last_sync_status
+    async with _sync_lock:
+        last_sync_status = await asyncio.to_thread(check_drive_sync)
+    return last_sync_status
+
+async def _periodic_sync(interval: int):
+    while True:
+        try:
+            await run_drive_sync()
+        except Exception as e:
+            print(f"❌ Eroare sincronizare periodică: {e}")
+        await asyncio.sleep(interval)
+
+@app.post("/sync")
+async def sync_endpoint():
+    """Declanșează manual sincronizarea Drive -> index local."""
+    return await run_drive_sync()
 
 # === Helpers ===
-def cosine_similarity(a: List[float], b: List[float]) -> float:
-    a = np.array(a)
-    b = np.array(b)
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-
-def build_drive_query(keywords: List[str], date_after: Optional[str], date_before: Optional[str]) -> str:
-    """Legacy function - kept for backward compatibility"""
-    conditions = ["trashed = false"]
-    if keywords:
-        kw_conditions = [f"name contains '{kw}'" for kw in keywords]
-        conditions.append("(" + " or ".join(kw_conditions) + ")")
-    if date_after:
-        conditions.append(f"modifiedTime >= '{date_after}T00:00:00Z'")
-    if date_before:
-        conditions.append(f"modifiedTime <= '{date_before}T23:59:59Z'")
-    q = " and ".join(conditions)
-    return q
+EMBED_CACHE_MAX = 2048
+EMBED_CACHE: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+_EMBED_INFLIGHT: dict = {}
+
+async def _fetch_embedding(model: str, text: str) -> np.ndarray:
+    resp = await aclient.embeddings.create(model=model, input=text)
+    emb = np.asarray(resp.data[0].embedding, dtype=np.float32)
+    emb.flags.writeable = False
+    return emb
+
+async def embed_query(text: str, model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """Embedding OpenAI (float32, read-only) memorat LRU după (model, text).
+
+    Cereri simultane pentru același text așteaptă un singur apel OpenAI.
+    """
+    key = (model, text)
+    if key in EMBED_CACHE:
+        EMBED_CACHE.move_to_end(key)
+        return EMBED_CACHE[key]
+
+    task = _EMBED_INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_embedding(model, text))
+        _EMBED_INFLIGHT[key] = task
+        task.add_done_callback(lambda _: _EMBED_INFLIGHT.pop(key, None))
+    emb = await asyncio.shield(task)
+
+    EMBED_CACHE[key] = emb
+    EMBED_CACHE.move_to_end(key)
+    if len(EMBED_CACHE) > EMBED_CACHE_MAX:
+        EMBED_CACHE.popitem(last=False)
+    return emb
+
+# === Buget de context pentru răspunsul GPT ===
+CONTEXT_TOKEN_BUDGET = 60000
+DOC_TOKEN_LIMIT = 4000
+_ENCODING = load_encoding("o200k_base")  # tokenizer-ul gpt-4o-mini
+
+def build_answer_context(top_docs: List[dict], budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Selectează greedy, în ordinea scorului, fragmente întregi până se atinge bugetul de tokeni."""
+    parts = []
+    for d in top_docs:
+        snippet, n_tokens = truncate_tokens(f"{d['name']}: {d['text']}", DOC_TOKEN_LIMIT, _ENCODING)
+        if n_tokens > budget:
+            break
+        budget -= n_tokens
+        parts.append(snippet)
+    return "\n\n".join(parts)
+
+def score_documents(q: np.ndarray, index: SearchIndex) -> np.ndarray:
+    """Similaritatea cosinus dintre q (normalizat) și fiecare rând din index.matrix."""
+    matrix = index.matrix
+    if matrix.dtype == np.int8:
+        q_i8, _ = quantize_int8(q)
+        if simsimd is not None:
+            dots = np.asarray(simsimd.cdist(q_i8[None, :], matrix, metric="dot")).ravel()
+        else:
+            dots = matrix @ q_i8.astype(np.int32)
+        # cosinusul vectorilor cuantizați, deci mereu în [-1, 1]
+        norms = index.i8_norms * np.linalg.norm(q_i8.astype(np.float32))
+        return (dots / norms.clip(min=1e-12)).astype(np.float32)
+    if simsimd is not None:
+        # SimSIMD face upcast intern (f16 -> f32) la acumulare
+        distances = simsimd.cdist(q.astype(matrix.dtype)[None, :], matrix, metric="cosine")
+        return 1.0 - np.asarray(distances, dtype=np.float32).ravel()
+    if matrix.dtype == np.float16:
+        return matrix.astype(np.float32) @ q
+    return matrix @ q
+
+def rank_documents(query_emb: List[float], top_n: int = 10, index: Optional[SearchIndex] = None):
+    """
+    Scorează toate documentele printr-un singur produs matrice-vector (BLAS)
+    și întoarce (indici, scoruri) pentru primele top_n, ordonate descrescător.
+    Indicii se referă la `index.docs`; apelantul păstrează același `index` până îi folosește.
+    """
+    index = index or INDEX
+    if index.matrix.shape[0] == 0 or top_n <= 0:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.float32)
+
+    q = np.asarray(query_emb, dtype=np.float32)
+    q = q / (np.linalg.norm(q) + 1e-12)
+    k = min(top_n, index.matrix.shape[0])
+
+    if index.faiss is not None:
+        top_scores, top_idx = index.faiss.search(q[None, :], k)
+        return top_idx[0], top_scores[0]
+
+    # Rândurile sunt validate la încărcare; un NaN rămas (ex. query invalid) e doar mascat
+    scores = score_documents(q, index)
+    scores = np.where(np.isfinite(scores), scores, -np.inf)
+    top_idx = np.argpartition(-scores, k - 1)[:k]
+    top_idx = top_idx[np.argsort(-scores[top_idx])]
+    top_idx = top_idx[np.isfinite(scores[top_idx])]
+    return top_idx, scores[top_idx]
 
 # === NEW ENDPOINT: /drive-search ===
 @app.post("/drive-search", response_model=DriveSearchResponse)
@@ -343,7 +485,7 @@ async def drive_search_endpoint(req: DriveSearchRequest):
         if req.page_token:
             params["pageToken"] = req.page_token
         
-        results = drive_service.files().list(**params).execute()
+        results = await asyncio.to_thread(list_drive_files, **params)
         
         files = results.get("files", [])
         next_page_token = results.get("nextPageToken")
@@ -366,45 +508,70 @@ async def hybrid_search_endpoint(req: HybridSearchRequest):
     Fuzionează rezultatele și le ordonează după relevanță.
     """
     try:
-        # Rulează ambele căutări în paralel
-        drive_task = asyncio.create_task(search_drive_internal(req.query, req.filters))
-        semantic_task = asyncio.create_task(search_semantic_internal(req.query, req.top_n or 10))
+        filters = req.filters or SearchFilters()
+        drive_q = build_drive_query_extended(
+            query=req.query,
+            mime_types=filters.mime_types,
+            date_after=filters.date_after,
+            date_before=filters.date_before,
+            folder_id=filters.folder_id,
+            use_fulltext=True
+        )
         
-        drive_results, semantic_results = await asyncio.gather(drive_task, semantic_task)
+        # Rulează ambele căutări în paralel; tot request-ul folosește aceeași versiune a indexului
+        index = INDEX
+        drive_task = asyncio.create_task(search_drive_internal(req.query, req.filters, drive_q))
+        semantic_task = asyncio.create_task(search_semantic_internal(req.query, req.top_n or 10, index))
         
-        # Fuzionare rezultate
-        merged = []
-        seen_ids = set()
+        # Embedding-ul query-ului (memorat, refolosit de căutarea semantică) decide dacă
+        # un query aproape identic, cu aceleași filtre, are deja un răspuns
+        cache_key = (req.filters.model_dump_json() if req.filters else None, req.top_n)
+        q_norm = None
+        try:
+            q_norm = _normalize(await embed_query(req.query))
+        except Exception as e:
+            print(f"⚠️ Eroare embedding pentru cache: {e}")
+        if q_norm is not None:
+            cached = HYBRID_CACHE.lookup(q_norm, index.generation, cache_key)
+            if cached is not None:
+                drive_task.cancel()
+                semantic_task.cancel()
+                print("♻️ Răspuns hibrid servit din cache-ul semantic")
+                return cached.model_copy(update={"query": req.query})
+        
+        # Rezultatele semantice cu scor > 0 se sortează înaintea celor Drive (scor 0), deci dacă
+        # sunt cel puțin 5 ele sunt top-ul trimis la GPT: răspunsul pornește imediat, în paralel cu Drive
+        semantic_results = await semantic_task
+        gpt_task = None
+        if len(semantic_results) >= 5 and semantic_results[4]["score"] > 0:
+            top_local = [local_hybrid_result(r) for r in semantic_results[:5]]
+            gpt_task = asyncio.create_task(generate_hybrid_answer(req.query, top_local))
+        
+        # Potrivire semantică foarte bună: răspunsul vine din indexul local, căutarea Drive
+        # (pornită speculativ) nu mai e așteptată
+        if semantic_results and semantic_results[0]["score"] >= HYBRID_DIRECT_SCORE:
+            drive_task.cancel()
+            drive_results = []
+        else:
+            drive_results = await drive_task
         
-        # Adaugă rezultate semantice (prioritate)
+        # Fuzionare rezultate: un singur rezultat per id, cel semantic are prioritate
+        by_id = {}
         for sem_result in semantic_results:
-            doc_id = sem_result.get("id", sem_result["name"])
-            if doc_id not in seen_ids:
-                seen_ids.add(doc_id)
-                merged.append(HybridResult(
-                    source="local",
-                    id=doc_id,
-                    name=sem_result["name"],
-                    mimeType=sem_result.get("mimeType"),
-                    webViewLink=sem_result.get("webViewLink"),
-                    modifiedTime=sem_result.get("modifiedTime"),
-                    size=sem_result.get("size"),
-                    snippet=sem_result.get("text", "")[:300],
-                    score_semantic=sem_result["score"],
-                    title_hit=False
-                ))
+            result = local_hybrid_result(sem_result)
+            by_id.setdefault(result.id, result)
+        
+        # title_hit: oricare cuvânt din query (de minim 3 litere, ca "de"/"la" să nu conteze)
+        # apare în nume; un singur regex compilat, o singură scanare per nume
+        tokens = [t for t in req.query.split() if len(t) > 2] or req.query.split()
+        title_pattern = re.compile("|".join(map(re.escape, tokens)), re.IGNORECASE) if tokens else None
         
         # Adaugă rezultate Drive (dacă nu sunt duplicate)
         for drive_file in drive_results:
-            if drive_file["id"] not in seen_ids:
-                seen_ids.add(drive_file["id"])
+            if drive_file["id"] not in by_id:
+                title_hit = bool(title_pattern and title_pattern.search(drive_file["name"]))
                 
-                # Check dacă query match-uiește în titlu
-                query_lower = req.query.lower()
-                name_lower = drive_file["name"].lower()
-                title_hit = query_lower in name_lower
-                
-                merged.append(HybridResult(
+                by_id[drive_file["id"]] = HybridResult(
                     source="drive",
                     id=drive_file["id"],
                     name=drive_file["name"],
@@ -415,96 +582,107 @@ async def hybrid_search_endpoint(req: HybridSearchRequest):
                     snippet=None,
                     score_semantic=None,
                     title_hit=title_hit
-                ))
+                )
         
         # Sortare: semantic score desc > title_hit > modifiedTime desc
-        def sort_key(item):
-            score = item.score_semantic or 0
-            title = 1 if item.title_hit else 0
-            time = item.modifiedTime or ""
-            return (-score, -title, time)
-        
-        merged.sort(key=sort_key, reverse=True)
+        merged = sorted(
+            by_id.values(),
+            key=lambda r: (r.score_semantic or 0, bool(r.title_hit), r.modifiedTime or ""),
+            reverse=True
+        )
         
         # Generează răspuns GPT bazat pe top rezultate
-        gpt_answer = await generate_hybrid_answer(req.query, merged[:5])
+        if gpt_task is not None:
+            gpt_answer = await gpt_task
+        else:
+            gpt_answer = await generate_hybrid_answer(req.query, merged[:5])
         
         drive_count = sum(1 for r in merged if r.source == "drive")
         local_count = sum(1 for r in merged if r.source == "local")
         
-        return HybridSearchResponse(
+        response = HybridSearchResponse(
             query=req.query,
             gpt_answer=gpt_answer,
             results=merged,
             counts={"drive": drive_count, "local": local_count},
-            query_used=build_drive_query_extended(
-                req.query, 
-                req.filters.mime_types if req.filters else None,
-                req.filters.date_after if req.filters else None,
-                req.filters.date_before if req.filters else None
-            )
+            query_used=drive_q
         )
+        if q_norm is not None:
+            HYBRID_CACHE.store(q_norm, response, index.generation, cache_key)
+        return response
         
     except Exception as e:
         print(f"❌ Eroare în /hybrid-search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # === Helper Functions for Hybrid Search ===
-async def search_drive_internal(query: str, filters: Optional[SearchFilters]) -> List[dict]:
-    """Căutare Drive internă (folosită de hybrid)"""
+HYBRID_DIRECT_SCORE = 0.7  # scor semantic peste care /hybrid-search nu mai așteaptă Drive
+
+def local_hybrid_result(sem_result: dict) -> HybridResult:
+    """Convertește un rezultat din search_semantic_internal în HybridResult."""
+    return HybridResult(
+        source="local",
+        id=sem_result.get("id", sem_result["name"]),
+        name=sem_result["name"],
+        mimeType=sem_result.get("mimeType"),
+        webViewLink=sem_result.get("webViewLink"),
+        modifiedTime=sem_result.get("modifiedTime"),
+        size=sem_result.get("size"),
+        snippet=sem_result.get("snippet", ""),
+        score_semantic=sem_result["score"],
+        title_hit=False
+    )
+
+async def search_drive_internal(query: str, filters: Optional[SearchFilters], q: Optional[str] = None) -> List[dict]:
+    """Căutare Drive internă (folosită de hybrid); `q` = query Drive deja construit, dacă există"""
     try:
-        f = filters or SearchFilters()
-        q = build_drive_query_extended(
-            query=query,
-            mime_types=f.mime_types,
-            date_after=f.date_after,
-            date_before=f.date_before,
-            folder_id=f.folder_id,
-            use_fulltext=True
-        )
+        if q is None:
+            f = filters or SearchFilters()
+            q = build_drive_query_extended(
+                query=query,
+                mime_types=f.mime_types,
+                date_after=f.date_after,
+                date_before=f.date_before,
+                folder_id=f.folder_id,
+                use_fulltext=True
+            )
         
-        results = drive_service.files().list(
+        results = await asyncio.to_thread(
+            list_drive_files,
             q=q,
             orderBy="modifiedTime desc",
-            fields="files(id, name, mimeType, webViewLink, webContentLink, modifiedTime, size)",
+            fields="files(id, name, mimeType, webViewLink, modifiedTime, size)",  # exact câmpurile din HybridResult
             pageSize=20
-        ).execute()
+        )
         
         return results.get("files", [])
     except Exception as e:
         print(f"⚠️ Eroare search_drive_internal: {e}")
         return []
 
-async def search_semantic_internal(query: str, top_n: int = 10) -> List[dict]:
+async def search_semantic_internal(query: str, top_n: int = 10, index: Optional[SearchIndex] = None) -> List[dict]:
     """Căutare semantică internă (folosită de hybrid)"""
     try:
         # Creare embedding
-        query_emb = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=query
-        ).data[0].embedding
-        
-        # Calculare similaritate
-        scored = []
-        for d in docs:
-            try:
-                score = cosine_similarity(query_emb, d["embedding"])
-                scored.append({
-                    "id": d.get("id", d["name"]),
-                    "name": d["name"],
-                    "text": d.get("text", ""),
-                    "score": float(score),
-                    "mimeType": d.get("mimeType"),
-                    "webViewLink": d.get("webViewLink"),
-                    "modifiedTime": d.get("modifiedTime"),
-                    "size": d.get("size")
-                })
-            except Exception as e:
-                print(f"⚠️ Eroare scor pentru {d.get('name')}: {e}")
-                continue
-        
-        scored.sort(key=lambda x: x["score"], reverse=True)
-        return scored[:top_n]
+        query_emb = await embed_query(query)
+        
+        # Calculare similaritate: top_n prin argpartition, fără sortarea întregului corpus
+        index = index or INDEX
+        docs = index.docs
+        top_idx, top_scores = rank_documents(query_emb, top_n, index)
+        return [
+            {
+                "id": docs[i].get("id", docs[i]["name"]),
+                "name": docs[i]["name"],
+                "snippet": docs[i].get("snippet", ""),
+                "score": float(score),
+                "mimeType": docs[i].get("mimeType"),
+                "webViewLink": docs[i].get("webViewLink"),
+                "modifiedTime": docs[i].get("modifiedTime"),
+                "size": docs[i].get("size")
+            }
+            for i, score in zip(top_idx, top_scores)
+        ]
         
     except Exception as e:
         print(f"⚠️ Eroare search_semantic_internal: {e}")
@@ -532,7 +710,7 @@ Oferă un răspuns concis care:
 - Indică dacă sunt din Drive sau indexul local
 - Sugerează care sunt cele mai relevante"""
 
-        response = client.chat.completions.create(
+        response = await aclient.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "Ești un asistent care rezumă rezultate de căutare."},
@@ -550,43 +728,36 @@ Oferă un răspuns concis care:
 # === LEGACY ENDPOINTS (păstrate pentru backward compatibility) ===
 async def drive_search(query: str):
     """Legacy drive search - păstrat pentru /ask endpoint"""
-    prompt = f"""Utilizatorul a cerut: "{query}".
-Extrage instrucțiuni pentru căutare în Google Drive.
-Răspunde DOAR cu JSON valid:
-{{
-  "keywords": ["cuvant1"],
-  "date_after": "YYYY-MM-DD" sau null,
-  "date_before": "YYYY-MM-DD" sau null,
-  "order": "desc",
-  "answer": "Răspuns scurt"
-}}"""
+    prompt = f'Utilizatorul a cerut: "{query}". Extrage instrucțiuni pentru căutare în Google Drive.'
 
     try:
-        resp = client.chat.completions.create(
+        resp = await aclient.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": "Ești un asistent JSON."},
+                {"role": "system", "content": "Generezi planuri de căutare Google Drive."},
                 {"role": "user", "content": prompt},
             ],
-            temperature=0.3
+            temperature=0.3,
+            response_format=DRIVE_PLAN_FORMAT
         )
         content = resp.choices[0].message.content
         plan = extract_json_from_response(content)
         
-        keywords = plan.get("keywords", [query])
+        keywords = plan.get("keywords") or [query]
         date_after = plan.get("date_after")
         date_before = plan.get("date_before")
         order = plan.get("order", "desc")
         answer = plan.get("answer", f"Căutare pentru: {query}")
         
-        q = build_drive_query(answer, date_after, date_before)
+        q = build_drive_query(keywords, date_after, date_before)
         
-        results = drive_service.files().list(
+        results = await asyncio.to_thread(
+            list_drive_files,
             q=q,
             orderBy=f"createdTime {order}",
             fields="files(id, name, mimeType, webViewLink, webContentLink, createdTime)",
             pageSize=50
-        ).execute()
+        )
         files = results.get("files", [])
         
         return AskResponse(
@@ -603,55 +774,107 @@ Răspunde DOAR cu JSON valid:
             files=[]
         )
 
-async def semantic_search(query: str):
+def _sse(data, event: Optional[str] = None) -> str:
+    """Formatează un eveniment SSE; payload-ul e JSON ca să nu rupă framing-ul la newline."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {orjson.dumps(data).decode()}\n\n"
+
+async def _stream_answer(response: AskResponse, messages: Optional[List[dict]] = None,
+                         q_norm: Optional[np.ndarray] = None, generation: int = 0):
+    """
+    Generator SSE: întâi metadatele (refined_query, results, ...), apoi tokenii
+    răspunsului pe măsură ce sosesc. Fără `messages` trimite răspunsul deja gata.
+    """
+    yield _sse(response.model_dump(exclude={"gpt_answer"}), event="meta")
+
+    if messages is None:
+        yield _sse(response.gpt_answer)
+    else:
+        parts = []
+        try:
+            stream = await aclient.chat.completions.create(model="gpt-4o-mini", messages=messages, stream=True)
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield _sse(delta)
+        except Exception as e:
+            print(f"❌ Eroare streaming răspuns: {e}")
+            yield _sse(str(e), event="error")
+            return
+        response.gpt_answer = "".join(parts)
+        ASK_CACHE.store(q_norm, response, generation)
+
+    yield _sse(None, event="done")
+
+async def semantic_search(query: str, stream: bool = False):
     """Legacy semantic search - păstrat pentru /ask endpoint"""
-    sync_status = check_drive_sync()
-    
+    sync_status = last_sync_status
+    index = INDEX  # aceeași versiune a indexului pentru cache și scorare, chiar dacă se reîncarcă între timp
+
+    def respond(response: AskResponse):
+        if stream:
+            return StreamingResponse(_stream_answer(response), media_type="text/event-stream")
+        return response
+
+    # Rafinarea și embedding-ul speculativ al query-ului original rulează în paralel
+    refine_task = asyncio.create_task(aclient.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "Optimizează query-uri."},
+            {"role": "user", "content": f'Reformulează: "{query}"'},
+        ],
+        response_format=REFINE_FORMAT
+    ))
+    embed_task = asyncio.create_task(embed_query(query))
+
+    # Embedding-ul sosește de obicei înaintea rafinării: dacă query-ul original e deja
+    # în cache-ul semantic, răspundem imediat și anulăm rafinarea.
+    speculative_emb = (await asyncio.gather(embed_task, return_exceptions=True))[0]
+    if not isinstance(speculative_emb, BaseException):
+        cached = ASK_CACHE.lookup(_normalize(speculative_emb), index.generation)
+        if cached is not None:
+            refine_task.cancel()
+            print("♻️ Răspuns servit din cache-ul semantic")
+            # rafinarea a fost anulată, deci query-ul folosit e cel original
+            return respond(cached.model_copy(update={"refined_query": query, "sync_status": sync_status}))
+    refine_resp = (await asyncio.gather(refine_task, return_exceptions=True))[0]
+
     refined_query = query
-    try:
-        refine_resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Optimizează query-uri."},
-                {"role": "user", "content": f'Reformulează: "{query}"'},
-            ]
-        )
+    if not isinstance(refine_resp, BaseException):
         refined_content = refine_resp.choices[0].message.content
         refined_json = extract_json_from_response(refined_content)
-        refined_query = refined_json.get("refined", query)
-    except:
-        pass
+        refined_query = refined_json.get("refined") or query
 
     try:
-        query_emb = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=refined_query
-        ).data[0].embedding
+        if same_query(refined_query, query) and not isinstance(speculative_emb, BaseException):
+            query_emb = speculative_emb
+        else:
+            query_emb = await embed_query(refined_query)
     except Exception as e:
         print(f"❌ Eroare embedding: {e}")
-        return AskResponse(
+        return respond(AskResponse(
             gpt_answer="Eroare la procesare.",
             mode="semantic",
             results=[],
             sync_status=sync_status
-        )
-
-    scored = []
-    for d in docs:
-        try:
-            score = cosine_similarity(query_emb, d["embedding"])
-            scored.append({
-                "name": d["name"],
-                "text": d.get("text", ""),
-                "score": float(score)
-            })
-        except:
-            continue
-
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    top_docs = scored[:10]
-
-    context = "\n\n".join([f"{d['name']}: {d['text'][:15000]}" for d in top_docs])
+        ))
+
+    q_norm = _normalize(query_emb)
+    cached = ASK_CACHE.lookup(q_norm, index.generation)
+    if cached is not None:
+        print("♻️ Răspuns servit din cache-ul semantic")
+        return respond(cached.model_copy(update={"refined_query": refined_query, "sync_status": sync_status}))
+
+    top_idx, top_scores = rank_documents(query_emb, 10, index)
+    top_meta = [index.docs[i] for i in top_idx]
+    top_texts = await asyncio.to_thread(lambda: [read_doc_text(d, META_FILE) for d in top_meta])
+    top_docs = [
+        {"name": d["name"], "text": text, "score": float(score)}
+        for d, text, score in zip(top_meta, top_texts, top_scores)
+    ]
+
+    context = build_answer_context(top_docs)
     answer_prompt = f"""Întrebare: {query}
 Query rafinat: {refined_query}
 
@@ -660,30 +883,32 @@ Documente:
 
 Răspunde pe baza documentelor, menționează numele."""
 
-    answer_resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Răspunzi pe baza documentelor."},
-            {"role": "user", "content": answer_prompt},
-        ]
-    )
-    
-    answer = answer_resp.choices[0].message.content
-
-    return AskResponse(
-        gpt_answer=answer,
+    messages = [
+        {"role": "system", "content": "Răspunzi pe baza documentelor."},
+        {"role": "user", "content": answer_prompt},
+    ]
+    response = AskResponse(
+        gpt_answer="",
         refined_query=refined_query,
         mode="semantic",
         results=[DocumentOutSemantic(**d) for d in top_docs],
         sync_status=sync_status
     )
 
+    if stream:
+        return StreamingResponse(_stream_answer(response, messages, q_norm, index.generation), media_type="text/event-stream")
+
+    answer_resp = await aclient.chat.completions.create(model="gpt-4o-mini", messages=messages)
+    response.gpt_answer = answer_resp.choices[0].message.content
+    ASK_CACHE.store(q_norm, response, index.generation)
+    return response
+
 @app.post("/ask", response_model=AskResponse)
 async def ask(req: AskRequest):
     """Legacy endpoint - păstrat pentru backward compatibility"""
     try:
         if req.use_semantic_search:
-            return await semantic_search(req.query)
+            return await semantic_search(req.query, stream=req.stream)
         else:
             return await drive_search(req.query)
     except Exception as e:
@@ -0,0 +1,212 @@
+# shared, stateless helpers for the Drive / semantic search backends
+
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional
+import numpy as np
+import orjson
+from google_auth_httplib2 import AuthorizedHttp  # type: ignore
+from googleapiclient.discovery import build  # type: ignore
+from googleapiclient.http import build_http, set_user_agent  # type: ignore
+from openai import DefaultAsyncHttpxClient
+
+try:
+    import tiktoken  # type: ignore
+except ImportError:  # numărarea tokenilor cade pe estimarea ~4 caractere/token
+    tiktoken = None
+
+try:
+    import h2  # type: ignore  # noqa: F401  # HTTP/2 pentru httpx: pip install "httpx[http2]"
+except ImportError:  # HTTP/1.1, o conexiune per request concurent
+    h2 = None
+
+# === MIME Types Mapping ===
+MIME_TYPE_MAP = {
+    "pdf": "application/pdf",
+    "doc": "application/msword",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "xls": "application/vnd.ms-excel",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "ppt": "application/vnd.ms-powerpoint",
+    "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "txt": "text/plain",
+    "csv": "text/csv",
+    "zip": "application/zip",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png"
+}
+
+# === Client Google Drive ===
+def build_drive_service(creds):
+    """
+    Client Drive v3 cu răspunsuri comprimate: httplib2 trimite deja Accept-Encoding: gzip,
+    dar Google comprimă doar dacă și User-Agent-ul conține "gzip".
+    build_http() păstrează setările clientului implicit (timeout 60 s, fără redirect pe 308).
+    Clientul nu e thread-safe; fiecare thread are nevoie de al lui.
+    """
+    http = set_user_agent(build_http(), "drive-search (gzip)")
+    return build("drive", "v3", http=AuthorizedHttp(creds, http=http))
+
+# === Client HTTP OpenAI ===
+def build_openai_http_client():
+    """
+    Client httpx pentru AsyncOpenAI: cu h2 instalat, HTTP/2, deci request-urile concurente
+    (embedding-uri, chat) se multiplexează pe o singură conexiune TLS. Fără h2 întoarce
+    None, adică clientul implicit al SDK-ului. Timeout-urile și limitele rămân cele implicite.
+    """
+    if h2 is None:
+        return None
+    return DefaultAsyncHttpxClient(http2=True)
+
+# === Cuantizare int8 (aceeași pentru formatul de pe disc și scorarea din server) ===
+INT8_SCALE = 127
+
+def quantize_int8(x: np.ndarray):
+    """
+    Cuantizare int8 simetrică cu scală per rând (max |x| -> INT8_SCALE); întoarce (int8, scale),
+    cu x ≈ int8 * scale. Cosinusul e invariant la scală, deci scorarea poate ignora scala.
+    """
+    scale = np.abs(x).max(axis=-1, keepdims=True).clip(min=1e-12) / INT8_SCALE
+    return np.round(x / scale).astype(np.int8), scale[..., 0]
+
+# === Tokeni ===
+def load_encoding(name: str):
+    """Encoding-ul tiktoken `name`, sau None (tiktoken lipsă sau fără acces la fișierul BPE)."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+def truncate_tokens(text: str, limit: int, encoding) -> tuple:
+    """Trunchiază textul la `limit` tokeni; întoarce (text, număr tokeni). Fără encoding: ~4 caractere/token."""
+    if encoding is None:
+        text = text[:limit * 4]
+        return text, len(text) // 4 + 1
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) > limit:
+        tokens = tokens[:limit]
+        text = encoding.decode(tokens)
+    return text, len(tokens)
+
+# === Timestamp-uri Drive ===
+@lru_cache(maxsize=65536)
+def drive_timestamp(value: str) -> Optional[float]:
+    """
+    Un timestamp RFC 3339 din Drive (ex. modifiedTime) ca secunde epoch, sau None dacă
+    nu poate fi parsat. Compararea ca string depinde de formatul exact (fracțiuni, fus orar).
+    """
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+def is_newer(drive_time: str, local_time: str) -> bool:
+    """True dacă `drive_time` e după `local_time`; valorile neparsabile se compară ca string."""
+    drive_ts, local_ts = drive_timestamp(drive_time), drive_timestamp(local_time)
+    if drive_ts is None or local_ts is None:
+        return drive_time > local_time
+    return drive_ts > local_ts
+
+# === Parsare răspuns GPT ===
+def extract_json_from_response(content: str) -> dict:
+    """Parsează răspunsul GPT; cu response_format json_schema, OpenAI garantează JSON valid."""
+    if not content:
+        return {}
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        print(f"⚠️ Nu s-a putut parsa JSON din: {content[:200]}...")
+        return {}
+
+def escape_drive_query(text: str) -> str:
+    """Escape ghilimele simple pentru Drive API query."""
+    return text.replace("'", "\\'")
+
+def build_drive_query_extended(
+    query: str = "",
+    mime_types: List[str] = None,
+    date_after: Optional[str] = None,
+    date_before: Optional[str] = None,
+    folder_id: Optional[str] = None,
+    use_fulltext: bool = True
+) -> str:
+    """
+    Construiește query pentru Google Drive API cu filtre extinse.
+    
+    Args:
+        query: Textul căutării
+        mime_types: Lista de extensii (pdf, docx, etc.)
+        date_after: Data minimă (YYYY-MM-DD)
+        date_before: Data maximă (YYYY-MM-DD)
+        folder_id: ID-ul folderului (opțional)
+        use_fulltext: Dacă să includă fullText contains
+    """
+    # lru_cache cere argumente hashable: lista de tipuri devine tuple
+    return _build_drive_query_cached(
+        query, tuple(mime_types) if mime_types else None, date_after, date_before, folder_id, use_fulltext
+    )
+
+@lru_cache(maxsize=1024)
+def _build_drive_query_cached(
+    query: str,
+    mime_types: Optional[tuple],
+    date_after: Optional[str],
+    date_before: Optional[str],
+    folder_id: Optional[str],
+    use_fulltext: bool
+) -> str:
+    conditions = ["trashed = false"]
+    
+    # Query text (name + fullText)
+    if query and query.strip():
+        escaped_query = escape_drive_query(query.strip())
+        if use_fulltext:
+            conditions.append(f"(name contains '{escaped_query}' or fullText contains '{escaped_query}')")
+        else:
+            conditions.append(f"name contains '{escaped_query}'")
+    
+    # MIME types
+    if mime_types and len(mime_types) > 0:
+        mime_conditions = []
+        for ext in mime_types:
+            mime = MIME_TYPE_MAP.get(ext.lower())
+            if mime:
+                mime_conditions.append(f"mimeType = '{mime}'")
+        
+        if mime_conditions:
+            conditions.append("(" + " or ".join(mime_conditions) + ")")
+    
+    # Date filters
+    if date_after:
+        conditions.append(f"modifiedTime >= '{date_after}T00:00:00Z'")
+    
+    if date_before:
+        conditions.append(f"modifiedTime <= '{date_before}T23:59:59Z'")
+    
+    # Folder
+    if folder_id:
+        conditions.append(f"'{folder_id}' in parents")
+    
+    q = " and ".join(conditions)
+    return q
+
+def build_drive_query(keywords: List[str], date_after: Optional[str], date_before: Optional[str]) -> str:
+    """Legacy function - kept for backward compatibility"""
+    conditions = ["trashed = false"]
+    if keywords:
+        kw_conditions = [f"name contains '{kw}'" for kw in keywords]
+        conditions.append("(" + " or ".join(kw_conditions) + ")")
+    if date_after:
+        conditions.append(f"modifiedTime >= '{date_after}T00:00:00Z'")
+    if date_before:
+        conditions.append(f"modifiedTime <= '{date_before}T23:59:59Z'")
+    q = " and ".join(conditions)
+    return q
+
+# === Query-uri ===
+def same_query(a: str, b: str) -> bool:
+    """True dacă două query-uri diferă doar prin majuscule/spații."""
+    return " ".join(a.casefold().split()) == " ".join(b.casefold().split())
@@ -8,6 +8,8 @@ from googleapiclient.discovery import build  # type: ignore
 from google.oauth2 import service_account  # type: ignore
 from dotenv import load_dotenv
 
+from helpers import build_drive_query
+
 # === Config FastAPI ===
 app = FastAPI()
 
@@ -48,28 +50,6 @@ class AskResponse(BaseModel):
     gpt_answer: str
     files: List[DocumentOut]
 
-# === Helpers ===
-def build_drive_query(keywords: List[str], date_after: Optional[str], date_before: Optional[str]) -> str:
-    conditions = ["trashed = false"]
-
-    # keywords
-    if keywords:
-        kw_conditions = [f"name contains '{kw}'" for kw in keywords]
-        conditions.append("(" + " or ".join(kw_conditions) + ")")
-
-    # date after
-    if date_after:
-        conditions.append(f"modifiedTime >= '{date_after}T00:00:00Z'")
-
-    # date before
-    if date_before:
-        conditions.append(f"modifiedTime <= '{date_before}T23:59:59Z'")
-
-    q = " and ".join(conditions)
-    print("=== Drive Query ===", q)   # 👈 log query ca să vezi exact ce trimitem
-    return q
-
-
 # === Endpoint ===
 @app.post("/ask", response_model=AskResponse)
 async def ask(req: AskRequest):
@@ -117,6 +97,7 @@ async def ask(req: AskRequest):
 
     # 3. Construiește query
     q = build_drive_query(keywords, date_after, date_before)
+    print("=== Drive Query ===", q)   # 👈 log query ca să vezi exact ce trimitem
 
     # 4. Căutare în Drive
     results = drive_service.files().list(
@@ -0,0 +1,72 @@
+# Pydantic request/response models for the search API
+
+from pydantic import BaseModel
+from typing import List, Optional, Literal
+
+class SearchFilters(BaseModel):
+    mime_types: Optional[List[str]] = None
+    date_after: Optional[str] = None
+    date_before: Optional[str] = None
+    folder_id: Optional[str] = None
+
+class DriveSearchRequest(BaseModel):
+    query: str
+    page_size: Optional[int] = 50
+    page_token: Optional[str] = None
+    filters: Optional[SearchFilters] = None
+
+class DriveSearchResponse(BaseModel):
+    files: List[dict]
+    nextPageToken: Optional[str] = None
+    query_used: str
+
+class HybridSearchRequest(BaseModel):
+    query: str
+    filters: Optional[SearchFilters] = None
+    top_n: Optional[int] = 10
+
+class HybridResult(BaseModel):
+    source: Literal["drive", "local"]
+    id: str
+    name: str
+    mimeType: Optional[str] = None
+    webViewLink: Optional[str] = None
+    modifiedTime: Optional[str] = None
+    size: Optional[int] = None
+    snippet: Optional[str] = None
+    score_semantic: Optional[float] = None
+    title_hit: Optional[bool] = None
+
+class HybridSearchResponse(BaseModel):
+    mode: str = "hybrid"
+    query: str
+    gpt_answer: str
+    results: List[HybridResult]
+    counts: dict
+    query_used: Optional[str] = None
+
+class AskRequest(BaseModel):
+    query: str
+    use_semantic_search: bool = False
+    stream: bool = False  # doar semantic: răspuns GPT ca Server-Sent Events
+
+class DocumentOutDrive(BaseModel):
+    id: str
+    name: str
+    mimeType: str
+    webViewLink: str
+    webContentLink: Optional[str] = None
+    createdTime: Optional[str] = None
+
+class DocumentOutSemantic(BaseModel):
+    name: str
+    text: str
+    score: float
+
+class AskResponse(BaseModel):
+    gpt_answer: str
+    refined_query: Optional[str] = None
+    mode: str
+    files: Optional[List[DocumentOutDrive]] = None
+    results: Optional[List[DocumentOutSemantic]] = None
+    sync_status: Optional[dict] = None
@@ -1,26 +1,895 @@
-# analyses the drive for pdfs and creates embeddings for them in embeddings.json
+# analyses the drive for pdfs and creates embeddings for them in embeddings.npy + meta.jsonl
 
+import asyncio
+import atexit
+import functools
+import gzip
+import hashlib
 import io
-import json
+import logging
 import os
-from openai import OpenAI
+import multiprocessing
+import queue
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from openai import AsyncOpenAI, BadRequestError
 from tomlkit import date
-from googleapiclient.discovery import build  # type: ignore
 from googleapiclient.http import MediaIoBaseDownload  # type: ignore
 from google.oauth2 import service_account  # type: ignore
 from dotenv import load_dotenv
 import PyPDF2  # type: ignore
+import numpy as np
+import orjson
 from datetime import datetime
 
-def sync_pdfs(api_key: str = None, service_account_file: str = "service.json", embeddings_file: str = "embeddings.json") -> dict:
+from helpers import (
+    build_drive_service, build_openai_http_client, is_newer, load_encoding, truncate_tokens, quantize_int8,
+)
+
+try:
+    import pymupdf  # type: ignore  # extragere în C (MuPDF), mult mai rapidă decât PyPDF2
+except ImportError:  # fallback pe PyPDF2
+    pymupdf = None
+
+try:
+    import fcntl  # lock între procese pe fișierele indexului (POSIX)
+except ImportError:
+    fcntl = None
+
+try:
+    import zstandard  # type: ignore  # necesar doar pentru un META_FILE comprimat (.zst)
+except ImportError:
+    zstandard = None
+
+# === Logging: mesajele intră într-o coadă, iar un singur thread le scrie la stdout ===
+# Progresul per fișier (debug) apare doar într-un terminal, nu și în loguri de cron/server.
+# Se configurează la primul apel (sync_pdfs / load_store / main), nu la import: modulul e importat
+# și de serverul uvicorn (inclusiv în procesele de --reload/--workers) și de procesele de extragere.
+log = logging.getLogger("pdf_extractor")
+_logging_lock = threading.Lock()
+
+
+def _setup_logging():
+    with _logging_lock:
+        if log.handlers:  # deja configurat (ex. rulare prin data_extractor.py)
+            return
+        log_queue = queue.SimpleQueue()
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        listener = QueueListener(log_queue, handler)
+        listener.start()
+        atexit.register(listener.stop)  # golește coada la ieșire
+        log.addHandler(QueueHandler(log_queue))
+        log.setLevel(logging.DEBUG if sys.stdout.isatty() else logging.INFO)
+        log.propagate = False
+
+
+def _init_extract_worker():
+    """Initializer pentru procesele de extragere: nu loghează (nici prin handler-ul implicit)."""
+    log.addHandler(logging.NullHandler())
+    log.propagate = False
+
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBED_BATCH_SIZE = 100  # endpoint-ul acceptă până la 2048 input-uri per request
+EMBED_RETRIES = 3
+# Limita API-ului e 300k tokeni per request; fără tiktoken estimarea ~4 caractere/token e aproximativă, deci marjă
+EMBED_MAX_BATCH_TOKENS = 250_000
+EMBED_MAX_INPUT_TOKENS = 8191  # limita modelului per input
+_ENCODING = load_encoding("cl100k_base")  # tokenizer-ul modelelor text-embedding-3
+EMBED_TEXT_CHARS = 20000  # caractere trimise la embedding per document
+EMBED_CONCURRENCY = 4  # batch-uri de embedding în zbor simultan
+DOWNLOAD_CONCURRENCY = 10  # PDF-uri descărcate simultan (thread-uri dedicate)
+# Descărcare în bucăți de 4 MiB (implicit 100 MiB): o eroare de rețea reia doar bucata curentă
+DOWNLOAD_CHUNK_SIZE = 1 << 22
+DOWNLOAD_RETRIES = 3
+EXTRACT_WORKERS = os.cpu_count() or 1  # procese pentru parsarea PDF (CPU-bound, ocolește GIL-ul)
+DRIVE_PAGE_SIZE = 1000  # maximul acceptat de files().list
+PDF_QUERY = "mimeType='application/pdf' and trashed = false"
+# Listarea completă se împarte pe intervale disjuncte de createdTime (înainte de acest an, apoi
+# câte un an), listate în paralel: fiecare interval e paginat independent
+LIST_SHARD_FIRST_YEAR = 2016
+# Metadatele Drive păstrate pentru fiecare document; md5Checksum vine gratuit în listare
+DRIVE_META_KEYS = ("id", "name", "mimeType", "createdTime", "modifiedTime", "webViewLink", "md5Checksum")
+PDF_FIELDS = f"nextPageToken, files({', '.join(DRIVE_META_KEYS)})"
+CHANGES_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    f"changes(fileId, removed, file({', '.join(DRIVE_META_KEYS)}, trashed))"
+)
+CHANGES_TOKEN_FILE = "drive_changes.token"  # startPageToken pentru changes.list, lângă meta
+INDEX_LOCK_FILE = "index.lock"  # serializează sincronizările din mai multe procese (ex. uvicorn --workers)
+# Textul extras, după md5Checksum-ul Drive: o reindexare (ex. alt model de embedding) nu mai
+# descarcă și parsează din nou PDF-urile neschimbate. Cele mai vechi fișiere (atime) se șterg peste limită.
+TEXT_CACHE_DIR = "text_cache"
+TEXT_CACHE_MAX_FILES = 20000
+
+# === Stocare: matrice (N, D) + jurnal de metadate; fiecare linie are "row" = rândul vectorului ===
+VECTORS_FILE = "embeddings.npy"
+# "float16" = jumătate din float32, suficient pentru ranking cosinus; "int8" = un sfert din float32,
+# cuantizare simetrică cu scală per rând, scalele (float32) fiind salvate alături în *.scales.npy
+VECTORS_DTYPE = np.dtype(os.getenv("VECTORS_DTYPE", "float16"))
+VECTORS_BLOCK_ROWS = 4096  # rânduri convertite odată la scriere (float32 temporar doar pentru un bloc)
+# Un document per linie, append-only; cu extensia .zst (ex. meta.jsonl.zst) jurnalul e comprimat
+# zstd, fiecare adăugare fiind un frame nou (frame-urile concatenate formează un fișier valid)
+META_FILE = os.getenv("META_FILE", "meta.jsonl")
+META_ZSTD_LEVEL = 3
+LEGACY_META_FILE = "meta.json"  # formatul anterior: o singură listă JSON
+LEGACY_EMBEDDINGS_FILE = "embeddings.json"
+META_COMPACT_RATIO = 0.2  # jurnalul se rescrie când peste 20% din linii sunt înlocuite/șterse
+SNIPPET_CHARS = 300  # fragmentul afișat în rezultate, precalculat la indexare
+# Textul documentelor (max 15000 caractere) stă în afara jurnalului, câte un fișier gzip per id,
+# lângă META_FILE; serverul îl citește doar pentru documentele trimise la GPT
+TEXT_STORE_DIR = "text_store"
+
+
+def _meta_line(record: dict) -> bytes:
+    meta = {k: v for k, v in record.items() if k not in ("embedding", "text")}
+    return orjson.dumps(meta, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+
+
+def _scales_file(vectors_file: str) -> str:
+    return os.path.splitext(vectors_file)[0] + ".scales.npy"
+
+
+def _vectors_matrix(records: list):
+    """
+    Embedding-urile documentelor ca matrice normalizată L2, în VECTORS_DTYPE.
+    Întoarce (matrice, scale); pentru int8 rândul i se reconstituie ca matrice[i] * scale[i],
+    altfel scale e None.
+    """
+    scales = np.zeros(len(records), dtype=np.float32) if VECTORS_DTYPE == np.int8 else None
+    if not records:
+        return np.zeros((0, 0), dtype=VECTORS_DTYPE), scales
+    # Matricea finală e alocată o dată; conversia float32 se face pe blocuri, nu pe tot indexul
+    matrix = np.empty((len(records), len(records[0]["embedding"])), dtype=VECTORS_DTYPE)
+    for start in range(0, len(records), VECTORS_BLOCK_ROWS):
+        block = np.asarray([r["embedding"] for r in records[start:start + VECTORS_BLOCK_ROWS]], dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True).clip(min=1e-12)
+        end = start + len(block)
+        if scales is not None:
+            block, scales[start:end] = quantize_int8(block)
+        matrix[start:end] = block
+    return matrix, scales
+
+
+def _save_npy(path: str, array: np.ndarray):
+    """np.save atomic (fișier temporar + os.replace)."""
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+def _write_vectors(records: list, vectors_file: str):
+    """Scrie embedding-urile (normalizate L2, în VECTORS_DTYPE) în .npy, plus scalele pentru int8."""
+    matrix, scales = _vectors_matrix(records)
+    if scales is not None:
+        _save_npy(_scales_file(vectors_file), scales)
+    _save_npy(vectors_file, matrix)
+
+
+def _read_npy_header(f):
+    """(versiune, shape, dtype) din antetul unui .npy deschis; f rămâne poziționat la începutul datelor."""
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+    return version, shape, dtype
+
+
+def _npy_rows(vectors_file: str) -> int:
+    """Numărul de rânduri din .npy, citit doar din antet."""
+    if not os.path.exists(vectors_file):
+        return 0
+    with open(vectors_file, "rb") as f:
+        return _read_npy_header(f)[1][0]
+
+
+def _append_vectors(vectors_file: str, matrix: np.ndarray):
+    """
+    Adaugă rândurile `matrix` la finalul .npy existent, pe loc: datele se scriu la coadă,
+    apoi se rescrie antetul cu noul shape (care încape în padding-ul antetului vechi).
+    Întoarce indexul primului rând adăugat, sau None dacă fișierul trebuie rescris complet
+    (lipsă, gol, alt dtype/dimensiune, antet prea lung).
+    """
+    if not os.path.exists(vectors_file):
+        return None
+    with open(vectors_file, "r+b") as f:
+        version, shape, dtype = _read_npy_header(f)
+        data_offset = f.tell()
+        if dtype != matrix.dtype or not shape or shape[0] == 0 or shape[1:] != matrix.shape[1:]:
+            return None
+        header = io.BytesIO()
+        header_data = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                       "shape": (shape[0] + matrix.shape[0],) + shape[1:]}
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_data)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_data)
+        if header.tell() != data_offset:
+            return None
+        f.seek(data_offset + int(np.prod(shape)) * dtype.itemsize)
+        f.write(np.ascontiguousarray(matrix).tobytes())
+        f.flush()
+        # antetul se actualizează ultimul: o întrerupere lasă cel mult rânduri nereferite
+        f.seek(0)
+        f.write(header.getvalue())
+    return shape[0]
+
+
+def _meta_codec(meta_file: str):
+    """zstandard pentru un jurnal .zst, None pentru text simplu."""
+    if not meta_file.endswith(".zst"):
+        return None
+    if zstandard is None:
+        raise RuntimeError(f"{meta_file} necesită pachetul zstandard (pip install zstandard)")
+    return zstandard
+
+
+def _read_meta_file(meta_file: str) -> bytes:
+    """Conținutul (decomprimat) al jurnalului. Un .zst corupt ridică ValueError, ca JSON-ul invalid."""
+    with open(meta_file, "rb") as f:
+        data = f.read()
+    codec = _meta_codec(meta_file)
+    if codec is None:
+        return data
+    try:
+        return codec.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True).read()
+    except codec.ZstdError as e:
+        raise ValueError(f"{meta_file} nu poate fi decomprimat: {e}") from e
+
+
+def _encode_meta(meta_file: str, data: bytes) -> bytes:
+    codec = _meta_codec(meta_file)
+    return data if codec is None else codec.ZstdCompressor(level=META_ZSTD_LEVEL).compress(data)
+
+
+def _write_meta_file(meta_file: str, chunks, replace: bool = True):
+    """
+    Scrie jurnalul atomic (fișier temporar + os.replace) din `chunks` (bytes), pe măsură ce
+    sunt produse, fără un buffer cu tot conținutul; replace=False lasă doar fișierul .tmp.
+    """
+    codec = _meta_codec(meta_file)
+    with open(meta_file + ".tmp", "wb") as f:
+        if codec is None:
+            f.writelines(chunks)
+        else:
+            with codec.ZstdCompressor(level=META_ZSTD_LEVEL).stream_writer(f, closefd=False) as writer:
+                for chunk in chunks:
+                    writer.write(chunk)
+    if replace:
+        os.replace(meta_file + ".tmp", meta_file)
+
+
+def _fill_snippets(items: list) -> list:
+    """Completează snippet-ul documentelor indexate înainte de acest câmp (din textul lor inline)."""
+    for item in items:
+        if "snippet" not in item:
+            item["snippet"] = item.get("text", "")[:SNIPPET_CHARS]
+    return items
+
+
+def _text_path(doc_id: str, meta_file: str) -> str:
+    return os.path.join(os.path.dirname(meta_file), TEXT_STORE_DIR, f"{doc_id}.txt.gz")
+
+
+def _write_texts(records, meta_file: str):
+    """Scrie în TEXT_STORE_DIR textul documentelor care îl au în memorie (noi sau din jurnale vechi)."""
+    records = [r for r in records if "text" in r]
+    if not records:
+        return
+    os.makedirs(os.path.join(os.path.dirname(meta_file), TEXT_STORE_DIR), exist_ok=True)
+    for r in records:
+        path = _text_path(r["id"], meta_file)
+        with open(path + ".tmp", "wb") as f:
+            f.write(gzip.compress(r["text"].encode("utf-8"), mtime=0))
+        os.replace(path + ".tmp", path)
+
+
+def _delete_texts(doc_ids, meta_file: str):
+    for doc_id in doc_ids:
+        try:
+            os.remove(_text_path(doc_id, meta_file))
+        except FileNotFoundError:
+            pass
+
+
+def read_doc_text(doc: dict, meta_file: str = META_FILE) -> str:
+    """Textul unui document: din TEXT_STORE_DIR, sau din metadate pentru liniile scrise înainte de el."""
+    if "text" in doc:
+        return doc["text"]
+    try:
+        with open(_text_path(doc["id"], meta_file), "rb") as f:
+            return gzip.decompress(f.read()).decode("utf-8")
+    except FileNotFoundError:
+        return ""
+
+
+def save_store(records: list, vectors_file: str = VECTORS_FILE, meta_file: str = META_FILE):
+    """
+    Rescrie complet (compactat) indexul: vectorii în .npy, câte o linie de metadate per
+    document și textele încă păstrate în metadate; textele documentelor scoase se șterg.
+    """
+    for i, r in enumerate(records):
+        r["row"] = i
+    _write_texts(_fill_snippets(records), meta_file)
+    _write_meta_file(meta_file, (_meta_line(r) for r in records), replace=False)
+    _write_vectors(records, vectors_file)
+    os.replace(meta_file + ".tmp", meta_file)
+    try:
+        stored = {name[:-len(".txt.gz")] for name in os.listdir(os.path.join(os.path.dirname(meta_file), TEXT_STORE_DIR))
+                  if name.endswith(".txt.gz")}
+    except FileNotFoundError:
+        return
+    _delete_texts(stored - {r["id"] for r in records}, meta_file)
+
+
+def append_store(records: list, new_records: list, vectors_file: str = VECTORS_FILE, meta_file: str = META_FILE,
+                 deleted_ids=()):
+    """
+    Salvare incrementală: doar `new_records` se serializează, ca linii noi la finalul
+    jurnalului (textul lor în TEXT_STORE_DIR), plus câte o linie de ștergere pentru `deleted_ids`. Documentele noi sau
+    reindexate (fără "row") primesc rânduri noi, adăugate pe loc la finalul .npy; cele cu
+    doar metadatele reîmprospătate își păstrează rândul. `records` sunt toate documentele
+    active, folosite la compactare: când liniile sau rândurile înlocuite depășesc
+    META_COMPACT_RATIO, indexul se rescrie cu save_store.
+    """
+    if not (os.path.exists(meta_file) and os.path.exists(vectors_file)):
+        save_store(records, vectors_file, meta_file)
+        return
+    fresh = [r for r in new_records if "row" not in r]
+    meta_log = _read_meta_file(meta_file)
+    n_lines = meta_log.count(b"\n") + len(new_records) + len(deleted_ids)
+    n_rows = _npy_rows(vectors_file) + len(fresh)
+    if max(n_lines, n_rows) - len(records) > META_COMPACT_RATIO * max(n_lines, n_rows):
+        log.info(f"🧹 Compactez indexul ({n_lines - len(records)} linii și {n_rows - len(records)} rânduri înlocuite)")
+        save_store(records, vectors_file, meta_file)
+        return
+    if fresh:
+        matrix, scales = _vectors_matrix(fresh)
+        start = _append_vectors(vectors_file, matrix)
+        if start is not None and scales is not None and _append_vectors(_scales_file(vectors_file), scales) != start:
+            start = None  # scale lipsă sau nealiniate: se rescriu ambele fișiere
+        if start is None:
+            save_store(records, vectors_file, meta_file)
+            return
+        for k, r in enumerate(fresh):
+            r["row"] = start + k
+    _write_texts(new_records, meta_file)
+    lines = [_meta_line(r) for r in new_records]
+    lines += [_meta_line({"id": doc_id, "deleted": True}) for doc_id in deleted_ids]
+    if meta_log and not meta_log.endswith(b"\n"):
+        lines.insert(0, b"\n")  # o linie trunchiată de o scriere întreruptă rămâne izolată
+    with open(meta_file, "ab") as f:
+        f.write(_encode_meta(meta_file, b"".join(lines)))
+    _delete_texts(deleted_ids, meta_file)
+
+
+def read_meta_log(meta_file: str = META_FILE) -> list:
+    """
+    Documentele active din jurnal: pentru fiecare id contează ultima linie, iar o linie
+    {"id": ..., "deleted": true} îl șterge. Ordinea e cea a ultimei apariții.
+    Liniile invalide (ex. trunchiate de o scriere întreruptă) sunt ignorate; dispar la compactare.
+    Liniile fără "row" (scrise înainte de jurnal, aliniate pe poziție) primesc numărul liniei.
+    """
+    live = {}
+    for line_no, line in enumerate(_read_meta_file(meta_file).splitlines()):
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            log.warning(f"⚠️ Ignor o linie invalidă din {meta_file}: {line[:80]!r}")
+            continue
+        live.pop(record["id"], None)
+        if not record.get("deleted"):
+            record.setdefault("row", line_no)
+            live[record["id"]] = record
+    return list(live.values())
+
+
+def load_store(vectors_file: str = VECTORS_FILE, meta_file: str = META_FILE, mmap: bool = True,
+               dequantize: bool = True):
+    """
+    Încarcă (meta, matrice), cu rândul i al matricei pentru meta[i]. Matricea e
+    memory-mapped (read-only) cât timp indexul e compactat; altfel se copiază rândurile active.
+    Un index int8 e reconstituit în float16, cu excepția dequantize=False (int8 brut, fără
+    scale; suficient pentru cosinus, care e invariant la scala rândului).
+    Formatele vechi (meta.json ca listă, sau embeddings.json) sunt migrate o singură dată.
+    Ridică FileNotFoundError dacă nu există niciun index.
+    """
+    _setup_logging()
+    plain_meta_file = meta_file[:-len(".zst")] if meta_file.endswith(".zst") else None
+    if not os.path.exists(meta_file) and plain_meta_file and os.path.exists(plain_meta_file):
+        log.info(f"🔁 Comprim {plain_meta_file} -> {meta_file}")
+        _write_meta_file(meta_file, [_read_meta_file(plain_meta_file)])
+    if not os.path.exists(meta_file) and os.path.exists(vectors_file) and os.path.exists(LEGACY_META_FILE):
+        log.info(f"🔁 Migrez {LEGACY_META_FILE} -> {meta_file}")
+        with open(LEGACY_META_FILE, "rb") as f:
+            legacy_meta = orjson.loads(f.read())
+        for i, item in enumerate(legacy_meta):
+            item["row"] = i  # meta.json era aliniat pe poziție cu embeddings.npy
+        _write_texts(_fill_snippets(legacy_meta), meta_file)
+        _write_meta_file(meta_file, (_meta_line(r) for r in legacy_meta))
+    if not (os.path.exists(vectors_file) and os.path.exists(meta_file)):
+        if not os.path.exists(LEGACY_EMBEDDINGS_FILE):
+            raise FileNotFoundError(f"{vectors_file} / {meta_file} nu există")
+        log.info(f"🔁 Migrez {LEGACY_EMBEDDINGS_FILE} -> {vectors_file} + {meta_file}")
+        with open(LEGACY_EMBEDDINGS_FILE, "rb") as f:
+            save_store(orjson.loads(f.read()), vectors_file, meta_file)
+
+    meta = _fill_snippets(read_meta_log(meta_file))
+    matrix = np.load(vectors_file, mmap_mode="r" if mmap else None)
+    scales = np.load(_scales_file(vectors_file)) if matrix.dtype == np.int8 else None
+    n_rows = matrix.shape[0] if scales is None else min(matrix.shape[0], scales.shape[0])
+    rows = np.fromiter((item["row"] for item in meta), dtype=np.intp, count=len(meta))
+    if rows.size and rows.max() >= n_rows:
+        raise ValueError(f"{meta_file} referă rândul {rows.max()}, dar {vectors_file} are {n_rows}")
+    if not np.array_equal(rows, np.arange(matrix.shape[0])):
+        # rânduri înlocuite/șterse până la compactare: se copiază doar cele active
+        matrix = matrix[rows]
+        scales = scales[rows] if scales is not None else None
+    if scales is not None and dequantize:
+        matrix = (matrix.astype(np.float32) * scales[:, None]).astype(np.float16)
+    return meta, matrix
+
+
+def embed_input(text: str) -> tuple:
+    """Textul trimis la embedding (max EMBED_TEXT_CHARS caractere și EMBED_MAX_INPUT_TOKENS tokeni) și numărul lui de tokeni."""
+    return truncate_tokens(text[:EMBED_TEXT_CHARS], EMBED_MAX_INPUT_TOKENS, _ENCODING)
+
+
+async def embed_batch(aclient: AsyncOpenAI, texts: list) -> list:
+    """
+    Creează embedding-uri pentru o listă de texte într-un singur request, cu retry per batch.
+    Un input respins (BadRequestError) nu se reîncearcă: batch-ul se împarte în două până
+    rămâne singur, iar în locul vectorului lui se întoarce excepția.
+    """
+    for attempt in range(EMBED_RETRIES):
+        try:
+            emb = await aclient.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+            return [item.embedding for item in sorted(emb.data, key=lambda d: d.index)]
+        except BadRequestError as e:
+            if len(texts) == 1:
+                return [e]
+            log.warning(f"⚠️ Batch de {len(texts)} texte respins ({e}), îl împart în două")
+            mid = len(texts) // 2
+            return await embed_batch(aclient, texts[:mid]) + await embed_batch(aclient, texts[mid:])
+        except Exception as e:
+            if attempt == EMBED_RETRIES - 1:
+                raise
+            log.warning(f"⚠️ Eroare embedding batch (încercarea {attempt + 1}): {e}")
+            await asyncio.sleep(2 ** attempt)
+
+
+def pdf_list_queries(first_year: int = LIST_SHARD_FIRST_YEAR) -> list:
+    """
+    Filtre `q` disjuncte care acoperă împreună toate PDF-urile: createdTime înainte de
+    `first_year`, câte un an până la cel curent, apoi restul. createdTime nu se schimbă,
+    deci un fișier apare într-un singur interval.
+    """
+    bounds = [f"{year}-01-01T00:00:00" for year in range(first_year, datetime.now().year + 1)]
+    queries = [f"{PDF_QUERY} and createdTime < '{bounds[0]}'"]
+    queries += [f"{PDF_QUERY} and createdTime >= '{lo}' and createdTime < '{hi}'" for lo, hi in zip(bounds, bounds[1:])]
+    queries.append(f"{PDF_QUERY} and createdTime >= '{bounds[-1]}'")
+    return queries
+
+
+def list_pdf_page(drive_service, page_token: str = None, query: str = PDF_QUERY, fields: str = PDF_FIELDS) -> dict:
+    """O pagină din lista de PDF-uri din Drive (blocant); continuarea e în `nextPageToken`."""
+    return drive_service.files().list(
+        q=query,
+        fields=fields,
+        pageSize=DRIVE_PAGE_SIZE,
+        pageToken=page_token
+    ).execute()
+
+
+def list_all_pdfs(drive_service_factory, fields: str = PDF_FIELDS) -> list:
+    """
+    Toate PDF-urile din Drive (blocant): intervalele din pdf_list_queries se listează în
+    paralel, fiecare paginat până la capăt. `drive_service_factory` trebuie să dea un client
+    per thread.
+    """
+    def list_query(query):
+        found, page_token = [], None
+        while True:
+            page = list_pdf_page(drive_service_factory(), page_token, query, fields)
+            found.extend(page.get("files", []))
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return found
+
+    queries = pdf_list_queries()
+    with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="drive-list") as pool:
+        return [f for found in pool.map(list_query, queries) for f in found]
+
+
+def list_changes_page(drive_service, page_token: str) -> dict:
+    """
+    O pagină din changes.list (blocant), în forma lui list_pdf_page: `files` = PDF-urile
+    adăugate/modificate, plus `removed` = id-urile șterse, aruncate la coș sau care nu mai
+    sunt PDF-uri, și `newStartPageToken` pe ultima pagină.
+    """
+    resp = drive_service.changes().list(
+        pageToken=page_token,
+        fields=CHANGES_FIELDS,
+        pageSize=DRIVE_PAGE_SIZE,
+        includeRemoved=True,
+        spaces="drive"
+    ).execute()
+    files, removed = [], []
+    for change in resp.get("changes", []):
+        f = change.get("file")
+        if change.get("removed") or not f or f.get("trashed") or f.get("mimeType") != "application/pdf":
+            removed.append(change["fileId"])
+        else:
+            files.append(f)
+    return {
+        "files": files,
+        "removed": removed,
+        "nextPageToken": resp.get("nextPageToken"),
+        "newStartPageToken": resp.get("newStartPageToken"),
+    }
+
+
+def needs_indexing(pdf: dict, existing_map: dict) -> bool:
+    """True pentru PDF-urile noi sau modificate de la ultima indexare."""
+    existing = existing_map.get(pdf["id"])
+    if existing is None:
+        return True
+    if pdf.get("modifiedTime") and existing.get("modifiedTime"):
+        if is_newer(pdf["modifiedTime"], existing["modifiedTime"]):
+            log.debug(f"🔄 PDF modificat: {pdf['name']}")
+            return True
+    return False
+
+
+def same_content(pdf: dict, existing_map: dict) -> bool:
+    """True dacă Drive raportează același md5 ca la indexare (modificare doar de metadate)."""
+    existing = existing_map.get(pdf["id"])
+    return bool(existing and pdf.get("md5Checksum") and pdf["md5Checksum"] == existing.get("md5Checksum"))
+
+
+def download_pdf(drive_service, f: dict) -> bytes:
+    """
+    Descarcă un PDF din Drive (blocant, I/O). Parsarea are nevoie de fișierul complet
+    (tabela xref e la final); suprapunerea cu extragerea se face între fișiere, în index_pdfs.
+    """
+    request = drive_service.files().get_media(fileId=f["id"])
+    fh = io.BytesIO()
+    downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+    done = False
+    while not done:
+        status, done = downloader.next_chunk(num_retries=DOWNLOAD_RETRIES)
+    return fh.getvalue()
+
+
+def _text_cache_path(md5: str) -> str:
+    return os.path.join(TEXT_CACHE_DIR, f"{md5}.txt")
+
+
+def read_cached_text(md5: str):
+    """Textul extras anterior dintr-un PDF cu acest md5, sau None."""
+    path = _text_cache_path(md5)
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return None
+    os.utime(path)  # atime actualizat explicit (relatime/noatime) pentru evicție LRU
+    return text
+
+
+def write_cached_text(md5: str, text: str):
+    """
+    Salvează textul extras, atomic (fișier temporar unic + os.replace): PDF-urile identice
+    (același md5) pot fi scrise simultan din thread-uri diferite. Cache-ul e best-effort:
+    o eroare de scriere e doar logată, documentul se indexează oricum.
+    """
+    tmp_path = None
+    try:
+        os.makedirs(TEXT_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=TEXT_CACHE_DIR, suffix=".tmp")
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, _text_cache_path(md5))
+    except OSError as e:
+        log.warning(f"⚠️ Nu am putut salva textul în cache (md5 {md5}): {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prune_text_cache(max_files: int = TEXT_CACHE_MAX_FILES):
+    """Șterge fișierele cele mai puțin folosite (după atime) peste `max_files`."""
+    try:
+        entries = [e for e in os.scandir(TEXT_CACHE_DIR) if e.name.endswith(".txt")]
+    except FileNotFoundError:
+        return
+    if len(entries) <= max_files:
+        return
+    entries.sort(key=lambda e: e.stat().st_atime)
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+    log.info(f"🧹 Text cache: șterse {len(entries) - max_files} fișiere vechi")
+
+
+def _join_pages(page_texts, sep: str, limit: int = EMBED_TEXT_CHARS) -> str:
+    """
+    Concatenează textul paginilor, oprindu-se după `limit` caractere: restul nu ajunge
+    nici la embedding, nici în metadate. `page_texts` e un generator, deci paginile
+    rămase nici nu mai sunt extrase.
+    """
+    parts = []
+    append = parts.append  # lookup local în bucla pe pagini
+    total = 0
+    for page_text in page_texts:
+        append(page_text)
+        total += len(page_text)
+        if total >= limit:
+            break
+    return sep.join(parts)
+
+
+def extract_pdf_text(data: bytes, name: str):
+    """
+    Extrage textul dintr-un PDF (CPU-bound). Funcție la nivel de modul ca să poată rula
+    într-un ProcessPoolExecutor. Întoarce (text, eroare extragere).
+    """
+    text = ""
+    error = None
+    try:
+        if pymupdf is not None:
+            with pymupdf.open(stream=data, filetype="pdf") as doc:
+                text = _join_pages((page.get_text("text") for page in doc), "\n")
+        else:
+            reader = PyPDF2.PdfReader(io.BytesIO(data))
+            text = _join_pages((page.extract_text() or "" for page in reader.pages), "")
+    except Exception as e:
+        text = "[Eroare la citirea PDF-ului]"
+        error = str(e)
+
+    if not text.strip():
+        text = "[PDF gol sau fără text selectabil]"
+    return text, error
+
+
+def text_hash(text: str) -> str:
+    """sha256 peste textul trimis la embedding: texte identice primesc același vector."""
+    return hashlib.sha256(text[:EMBED_TEXT_CHARS].encode("utf-8")).hexdigest()
+
+
+async def index_pdfs(api_key: str, drive_service_factory, existing_map: dict, files: list, removed: list,
+                     errors: list, fetch_pages=None, page_token: str = None):
+    """
+    Pipeline listare -> descărcare -> embedding, cu etapele suprapuse:
+    - fiecare funcție din `fetch_pages` își citește paginile pe rând, toate în paralel
+      (implicit list_pdf_page pe intervalele din pdf_list_queries = listare completă;
+      [list_changes_page] = doar modificările de la `page_token`); fiecare PDF listat se adaugă
+      în `files`, id-urile șterse în `removed`, iar PDF-urile noi/modificate intră într-o coadă;
+    - DOWNLOAD_CONCURRENCY workeri descarcă PDF-urile într-un ThreadPoolExecutor dedicat,
+      fiecare thread cu clientul Drive dat de `drive_service_factory`, iar textul se
+      extrage într-un pool de EXTRACT_WORKERS procese;
+    - batch-urile de EMBED_BATCH_SIZE texte pleacă la OpenAI concurent (max EMBED_CONCURRENCY);
+      un text identic (text_sha256) cu unul deja indexat sau în curs refolosește vectorul.
+    Întoarce (documentele indexate acum, newStartPageToken sau None). O eroare de listare se propagă.
+    """
+    aclient = AsyncOpenAI(api_key=api_key, http_client=build_openai_http_client())
+    embed_sem = asyncio.Semaphore(EMBED_CONCURRENCY)
+    queue = asyncio.Queue(maxsize=DOWNLOAD_CONCURRENCY * 2)  # backpressure pentru listare
+    indexed = []
+    pending = []  # (metadata Drive, text, sha256, textul trimis la embedding) care așteaptă embedding
+    pending_tokens = 0  # tokenii textelor din `pending` (estimați fără tiktoken)
+    batch_tasks = []
+    started = 0
+    loop = asyncio.get_running_loop()
+    # Pool propriu: executorul implicit al loop-ului poate avea mai puține thread-uri
+    # (min(32, cpu + 4)) și e folosit și de listare
+    download_pool = ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY, thread_name_prefix="drive-download")
+    extract_pool = None  # pornit la primul PDF de procesat
+    # Vectori după text_sha256: din index și din batch-urile deja embeduite
+    known_vectors = {doc["text_sha256"]: doc["embedding"] for doc in existing_map.values() if doc.get("text_sha256")}
+    duplicates = {}  # sha256 în curs de embedding -> [(metadata Drive, text)] care așteaptă același vector
+
+    def add_doc(f, text, sha, vector):
+        doc_data = {
+            **{key: f.get(key) for key in DRIVE_META_KEYS},
+            "text": text[:15000],  # salvează doar un rezumat
+            "snippet": text[:SNIPPET_CHARS],
+            "text_sha256": sha,
+            "embedding": vector
+        }
+
+        indexed.append(doc_data)
+        known_vectors[sha] = vector
+
+        # Actualizează în map; reindexatele trec la final, ca în jurnal
+        existing_map.pop(f["id"], None)
+        existing_map[f["id"]] = doc_data
+
+    async def embed_pending(batch):
+        async with embed_sem:
+            try:
+                vectors = await embed_batch(aclient, [embed_text for _, _, _, embed_text in batch])
+            except Exception as e:
+                log.error(f"❌ Eroare embedding pentru {len(batch)} PDF-uri: {e}")
+                vectors = [e] * len(batch)
+
+        for (f, text, sha, _), vector in zip(batch, vectors):
+            if isinstance(vector, Exception):
+                if isinstance(vector, BadRequestError):  # input respins; restul batch-ului a trecut
+                    log.error(f"❌ Eroare embedding {f['name']}: {vector}")
+                failed = [f] + [dup for dup, _ in duplicates.pop(sha, [])]
+                errors.extend({"file": d["name"], "error": str(vector)} for d in failed)
+                continue
+            add_doc(f, text, sha, vector)
+            for dup, dup_text in duplicates.pop(sha, []):
+                add_doc(dup, dup_text, sha, vector)
+
+    def flush_pending():
+        """Pornește embedding-ul textelor acumulate, fără să aștepte răspunsul."""
+        nonlocal pending_tokens
+        if pending:
+            batch_tasks.append(asyncio.create_task(embed_pending(pending[:])))
+            pending.clear()
+            pending_tokens = 0
+
+    new_start_token = None
+    page_no = 0
+    if fetch_pages is None:
+        fetch_pages = [functools.partial(list_pdf_page, query=query) for query in pdf_list_queries()]
+
+    async def produce_pages(fetch_page):
+        nonlocal new_start_token, page_no
+        next_token = page_token
+        while True:
+            page = await asyncio.to_thread(lambda: fetch_page(drive_service_factory(), next_token))
+            page_no += 1
+            page_files = page.get("files", [])
+            files.extend(page_files)
+            removed.extend(page.get("removed", []))
+            new_start_token = page.get("newStartPageToken") or new_start_token
+            new = [pdf for pdf in page_files if needs_indexing(pdf, existing_map)]
+            log.debug(f"📄 Pagina {page_no}: {len(page_files)} PDF-uri, {len(new)} de procesat (noi sau modificate)")
+            for pdf in new:
+                if same_content(pdf, existing_map):
+                    # Același conținut: fără download/embedding, se actualizează doar metadatele
+                    log.debug(f"♻️ Conținut neschimbat (md5), actualizez metadatele: {pdf['name']}")
+                    doc_data = {**existing_map.pop(pdf["id"]), **{key: pdf.get(key) for key in DRIVE_META_KEYS}}
+                    existing_map[pdf["id"]] = doc_data
+                    indexed.append(doc_data)
+                    continue
+                await queue.put(pdf)
+            next_token = page.get("nextPageToken")
+            if not next_token:
+                break
+
+    async def produce():
+        tasks = [asyncio.create_task(produce_pages(fetch_page)) for fetch_page in fetch_pages]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:  # la o eroare de listare, celelalte intervale se opresc
+                task.cancel()
+
+    async def worker():
+        nonlocal started, extract_pool, pending_tokens
+        while True:
+            f = await queue.get()
+            if f is None:
+                return
+            name = f["name"]
+            started += 1
+            log.debug(f"[{started}] ➡️ Descarc și procesez: {name}")
+            md5 = f.get("md5Checksum")
+            try:
+                text = await loop.run_in_executor(download_pool, read_cached_text, md5) if md5 else None
+                extract_error = None
+                if text is not None:
+                    log.debug(f"📦 Text din cache (md5 {md5}), fără descărcare: {name}")
+                else:
+                    data = await loop.run_in_executor(download_pool, lambda: download_pdf(drive_service_factory(), f))
+                    if extract_pool is None:
+                        # spawn: fork dintr-un proces cu thread-uri (serverul) poate moșteni lock-uri blocate
+                        extract_pool = ProcessPoolExecutor(
+                            max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                            initializer=_init_extract_worker,
+                        )
+                    text, extract_error = await loop.run_in_executor(extract_pool, extract_pdf_text, data, name)
+                    if md5 and not extract_error:
+                        await loop.run_in_executor(download_pool, write_cached_text, md5, text)
+            except Exception as e:
+                log.error(f"❌ Eroare procesare {name}: {e}")
+                errors.append({"file": name, "error": str(e)})
+                continue
+            if extract_error:
+                log.warning(f"⚠️ Nu am putut extrage text din {name}: {extract_error}")
+                errors.append({"file": name, "error": extract_error})
+
+            # === Embedding-ul se creează pe batch-uri, o singură dată per text ===
+            sha = text_hash(text)
+            if sha in known_vectors:
+                log.debug(f"♻️ Text identic cu un document indexat, refolosesc embedding-ul: {name}")
+                add_doc(f, text, sha, known_vectors[sha])
+                continue
+            if sha in duplicates:
+                duplicates[sha].append((f, text))
+                continue
+            duplicates[sha] = []
+            # batch-ul pleacă la EMBED_BATCH_SIZE texte sau înainte să depășească limita de tokeni
+            embed_text, tokens = embed_input(text)
+            if pending_tokens + tokens > EMBED_MAX_BATCH_TOKENS:
+                flush_pending()
+            pending.append((f, text, sha, embed_text))
+            pending_tokens += tokens
+            if len(pending) >= EMBED_BATCH_SIZE:
+                flush_pending()
+
+    workers = [asyncio.create_task(worker()) for _ in range(DOWNLOAD_CONCURRENCY)]
+    try:
+        try:
+            await produce()
+        except BaseException:
+            for w in workers:
+                w.cancel()
+            raise
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        flush_pending()
+        await asyncio.gather(*batch_tasks)
+        await asyncio.to_thread(prune_text_cache)
+    finally:
+        download_pool.shutdown(wait=False, cancel_futures=True)
+        if extract_pool is not None:
+            extract_pool.shutdown(cancel_futures=True)
+        await aclient.close()
+    return indexed, new_start_token
+
+
+def changes_token_file(meta_file: str = META_FILE) -> str:
+    """Fișierul cu tokenul changes.list; dacă există, următoarea sincronizare e incrementală."""
+    return os.path.join(os.path.dirname(meta_file), CHANGES_TOKEN_FILE)
+
+
+def sync_pdfs(api_key: str = None, service_account_file: str = "service.json", vectors_file: str = VECTORS_FILE, meta_file: str = META_FILE) -> dict:
+    """
+    Rulează _sync_pdfs sub un lock exclusiv (flock) lângă meta_file: fiecare proces care
+    sincronizează (ex. fiecare worker uvicorn cu _periodic_sync) citește, indexează și
+    salvează pe rând, deci adăugările în loc în .npy / meta.jsonl nu se suprapun.
+    """
+    _setup_logging()
+    if fcntl is None:
+        return _sync_pdfs(api_key, service_account_file, vectors_file, meta_file)
+    lock_file = os.path.join(os.path.dirname(meta_file), INDEX_LOCK_FILE)
+    with open(lock_file, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            log.info("⏳ O altă sincronizare rulează, aștept să se termine...")
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _sync_pdfs(api_key, service_account_file, vectors_file, meta_file)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _sync_pdfs(api_key: str = None, service_account_file: str = "service.json", vectors_file: str = VECTORS_FILE, meta_file: str = META_FILE) -> dict:
     start_time = datetime.now()
     """
-    Sincronizează PDF-urile din Google Drive cu embeddings.json
+    Sincronizează PDF-urile din Google Drive cu embeddings.npy + meta.jsonl
     
     Args:
         api_key: OpenAI API key (opțional, va fi citit din .env dacă nu e furnizat)
         service_account_file: Path la fișierul service account Google
-        embeddings_file: Path la fișierul JSON de output
+        vectors_file: Path la matricea .npy de output
+        meta_file: Path la fișierul JSON cu metadate
     
     Returns:
         dict cu status și statistici
@@ -32,164 +901,150 @@ def sync_pdfs(api_key: str = None, service_account_file: str = "service.json", e
     
     if not api_key:
         return {"status": "error", "error": "OPENAI_API_KEY nu este setat"}
-    
-    client = OpenAI(api_key=api_key)
 
     # === Config Google Drive ===
     SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
     
     try:
         creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=SCOPES)
-        drive_service = build("drive", "v3", credentials=creds)
     except Exception as e:
         return {"status": "error", "error": f"Eroare autentificare Google Drive: {str(e)}"}
 
-    # === Citește toate PDF-urile din Drive ===
-    print("📂 Se caută PDF-urile din Google Drive...")
-    try:
-        results = drive_service.files().list(
-            q="mimeType='application/pdf' and trashed = false",
-            fields="files(id, name, mimeType, createdTime, modifiedTime, webViewLink)",
-            pageSize=1000
-        ).execute()
-    except Exception as e:
-        return {"status": "error", "error": f"Eroare citire Drive: {str(e)}"}
-
-    files = results.get("files", [])
-    print(f"📊 Găsite {len(files)} PDF-uri în Drive")
-
     # === Încarcă embeddings existente ===
-    existing = []
     existing_map = {}
+    store_ok = False  # False -> indexul de pe disc lipsește/e invalid și se rescrie complet
 
-    if os.path.exists(embeddings_file):
-        with open(embeddings_file, "r", encoding="utf-8") as a:
-            try:
-                existing = json.load(a)
-                existing_map = {item["id"]: item for item in existing}
-                print(f"🔍 Am găsit {len(existing_map)} PDF-uri deja procesate în {embeddings_file}")
-            except json.JSONDecodeError:
-                print(f"⚠️ {embeddings_file} este gol sau invalid, voi procesa toate PDF-urile.")
-    else:
-        print(f"🔍 {embeddings_file} nu există, voi procesa toate PDF-urile.")
-
-    # === Determină ce trebuie procesat ===
-    to_process = []
-    for pdf in files:
-        pdf_id = pdf["id"]
-        if pdf_id not in existing_map:
-            # PDF nou
-            to_process.append(pdf)
-        elif pdf.get("modifiedTime") and existing_map[pdf_id].get("modifiedTime"):
-            # Verifică dacă a fost modificat
-            if pdf["modifiedTime"] > existing_map[pdf_id]["modifiedTime"]:
-                to_process.append(pdf)
-                print(f"🔄 PDF modificat: {pdf['name']}")
-
-    print(f"📂 Mai rămân {len(to_process)} PDF-uri de procesat (noi sau modificate)")
-
-    # === Procesează PDF-urile ===
-    indexed = []
-    errors = []
+    try:
+        meta, matrix = load_store(vectors_file, meta_file, mmap=False)
+        existing_map = {item["id"]: {**item, "embedding": row} for item, row in zip(meta, matrix)}
+        store_ok = True
+        log.info(f"🔍 Am găsit {len(existing_map)} PDF-uri deja procesate în {meta_file}")
+    except FileNotFoundError:
+        log.info(f"🔍 {meta_file} nu există, voi procesa toate PDF-urile.")
+    except ValueError as e:  # include orjson.JSONDecodeError
+        log.warning(f"⚠️ {meta_file} / {vectors_file} sunt goale sau invalide ({e}), voi procesa toate PDF-urile.")
 
-    for idx, f in enumerate(to_process, 1):
-        file_id = f["id"]
-        name = f["name"]
-        print(f"[{idx}/{len(to_process)}] ➡️ Descarc și procesez: {name}")
+    # === Listează PDF-urile din Drive și procesează-le pe măsură ce sosesc paginile ===
+    log.info("📂 Se caută PDF-urile din Google Drive...")
+    # Clientul Drive (httplib2) nu e thread-safe: fiecare thread își creează unul
+    local = threading.local()
 
-        try:
-            # === Descarcă PDF ===
-            request = drive_service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            
-            fh.seek(0)
-            
-            # === Extrage text din PDF ===
-            text = ""
+    def thread_drive_service():
+        if not hasattr(local, "service"):
+            local.service = build_drive_service(creds)
+        return local.service
+
+    # Cu un token salvat și un index valid se citesc doar modificările (changes.list);
+    # altfel listare completă, cu tokenul luat înainte ca modificările din timpul ei să nu se piardă
+    token_file = changes_token_file(meta_file)
+    page_token = None
+    if store_ok and os.path.exists(token_file):
+        with open(token_file, encoding="utf-8") as f:
+            page_token = f.read().strip() or None
+
+    files = []
+    removed = []
+    errors = []
+    try:
+        if page_token:
+            # index_pdfs modifică existing_map pe loc; la eșec se pornește din nou de la indexul de pe disc
+            snapshot = dict(existing_map)
             try:
-                reader = PyPDF2.PdfReader(fh)
-                for page in reader.pages:
-                    text += page.extract_text() or ""
+                indexed, new_token = asyncio.run(index_pdfs(
+                    api_key, thread_drive_service, existing_map, files, removed, errors,
+                    fetch_pages=[list_changes_page], page_token=page_token
+                ))
             except Exception as e:
-                print(f"⚠️ Nu am putut extrage text din {name}: {e}")
-                text = "[Eroare la citirea PDF-ului]"
-                errors.append({"file": name, "error": str(e)})
+                log.warning(f"⚠️ changes.list a eșuat ({e}), fac listarea completă")
+                page_token = None
+                existing_map = snapshot
+                files.clear()
+                removed.clear()
+                errors.clear()
+        if not page_token:
+            new_token = thread_drive_service().changes().getStartPageToken().execute()["startPageToken"]
+            indexed, _ = asyncio.run(index_pdfs(api_key, thread_drive_service, existing_map, files, removed, errors))
+            # Documentele care nu mai apar în Drive se scot din index
+            removed = list(existing_map.keys() - {f["id"] for f in files})
+    except Exception as e:
+        return {"status": "error", "error": f"Eroare citire Drive: {str(e)}"}
+    incremental = bool(page_token)
+    if incremental:
+        log.info(f"📊 {len(files)} PDF-uri noi/modificate și {len(removed)} șterse de la ultima sincronizare")
+    else:
+        log.info(f"📊 Găsite {len(files)} PDF-uri în Drive")
 
-            if not text.strip():
-                text = "[PDF gol sau fără text selectabil]"
-
-            # === Creează embedding ===
-            emb = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text[:20000]  # max ~20k caractere
-            )
-            vector = emb.data[0].embedding
-
-            doc_data = {
-                "id": file_id,
-                "name": name,
-                "mimeType": f.get("mimeType"),
-                "createdTime": f.get("createdTime"),
-                "modifiedTime": f.get("modifiedTime"),
-                "webViewLink": f.get("webViewLink"),
-                "text": text[:15000],  # salvează doar un rezumat
-                "embedding": vector
-            }
-            
-            indexed.append(doc_data)
-            
-            # Actualizează în map
-            existing_map[file_id] = doc_data
-            
-        except Exception as e:
-            print(f"❌ Eroare procesare {name}: {e}")
-            errors.append({"file": name, "error": str(e)})
-            continue
+    removed = [doc_id for doc_id in dict.fromkeys(removed) if doc_id in existing_map]
+    for doc_id in removed:
+        del existing_map[doc_id]
+    if removed:
+        log.info(f"🗑️ Scot din index {len(removed)} PDF-uri care nu mai sunt în Drive")
+    indexed = [doc for doc in indexed if doc["id"] in existing_map]
+
+    # Un PDF listat care n-a putut fi indexat s-ar pierde dacă tokenul avansează: la incremental
+    # tokenul vechi rămâne (changes.list îl va include din nou), la listarea completă tokenul
+    # se șterge, ca următoarea sincronizare să fie tot completă
+    if any(f["id"] not in existing_map for f in files if f["id"] not in removed):
+        log.warning("⚠️ Unele PDF-uri nu au fost indexate; nu avansez tokenul ca să fie reîncercate")
+        new_token = None
+        if not incremental and os.path.exists(token_file):
+            os.remove(token_file)
 
     # === Salvează embeddings actualizate ===
     all_data = list(existing_map.values())
     
     try:
-        with open(embeddings_file, "w", encoding="utf-8") as f:
-            json.dump(all_data, f, ensure_ascii=False, indent=2)
-        print(f"✅ {embeddings_file} actualizat cu succes!")
+        if not store_ok:
+            save_store(all_data, vectors_file, meta_file)
+            log.info(f"✅ {vectors_file} + {meta_file} actualizate cu succes!")
+        elif indexed or removed:
+            append_store(all_data, indexed, vectors_file, meta_file, deleted_ids=removed)
+            log.info(f"✅ {vectors_file} + {meta_file} actualizate cu succes!")
+        else:
+            log.info("✅ Niciun PDF nou sau modificat, indexul rămâne neschimbat.")
+        if new_token:
+            with open(token_file, "w", encoding="utf-8") as f:
+                f.write(new_token)
     except Exception as e:
         return {"status": "error", "error": f"Eroare salvare fișier: {str(e)}"}
 
     # === Return statistici ===
     result = {
         "status": "success",
-        "total_in_drive": len(files),
+        "mode": "incremental" if incremental else "full",
+        # la sincronizarea incrementală Drive nu e listat; indexul actualizat îl reflectă
+        "total_in_drive": len(all_data) if incremental else len(files),
         "total_indexed": len(all_data),
         "newly_processed": len(indexed),
         "errors": len(errors),
         "error_details": errors if errors else None
     }
     
-    print(f"\n📊 STATISTICI:")
-    print(f"   Total PDF-uri în Drive: {result['total_in_drive']}")
-    print(f"   Total în {embeddings_file}: {result['total_indexed']}")
-    print(f"   Procesate acum: {result['newly_processed']}")
+    log.info(f"\n📊 STATISTICI:")
+    log.info(f"   Total PDF-uri în Drive: {result['total_in_drive']}")
+    log.info(f"   Total în {meta_file}: {result['total_indexed']}")
+    log.info(f"   Procesate acum: {result['newly_processed']}")
     if errors:
-        print(f"   ⚠️ Erori: {result['errors']}")
+        log.info(f"   ⚠️ Erori: {result['errors']}")
     end_time = datetime.now()
     duration = end_time - start_time
-    print(f"   ⏱️ Durată: {duration}")
+    log.info(f"   ⏱️ Durată: {duration}")
     return result
 
 
 # === Pentru rulare standalone ===
-if __name__ == "__main__":
+def main():
+    _setup_logging()
     result = sync_pdfs()
     
     if result["status"] == "error":
-        print(f"\n❌ EROARE: {result['error']}")
+        log.error(f"\n❌ EROARE: {result['error']}")
         exit(1)
     else:
-        print(f"\n✅ Sincronizare completă!")
+        log.info(f"\n✅ Sincronizare completă!")
         if result["newly_processed"] == 0:
-            print("   Toate PDF-urile erau deja actualizate.")
\ No newline at end of file
+            log.info("   Toate PDF-urile erau deja actualizate.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# round-trip pentru indexul de pe disc: save_store / append_store / load_store
+
+import numpy as np
+import orjson
+import pytest
+
+import pdf_extractor as p
+
+DIM = 16
+
+
+def make_docs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {"id": f"id{i}", "name": f"doc{i}.pdf", "text": f"text {i}", "embedding": rng.standard_normal(DIM).tolist()}
+        for i in range(n)
+    ]
+
+
+def assert_vectors(meta, matrix, expected):
+    """Fiecare document încărcat are vectorul lui (cosinus ~1), nu al altui document."""
+    assert sorted(d["id"] for d in meta) == sorted(expected)
+    for doc, row in zip(meta, np.asarray(matrix, dtype=np.float32)):
+        want = np.asarray(expected[doc["id"]], dtype=np.float32)
+        cos = row @ want / (np.linalg.norm(row) * np.linalg.norm(want))
+        assert cos > 0.99, doc["id"]
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # fișierele legacy (meta.json, embeddings.json) sunt căutate în directorul curent
+    monkeypatch.setattr(p, "VECTORS_DTYPE", np.float16)
+
+
+@pytest.mark.parametrize("dtype", [np.float16, np.int8])
+def test_save_append_load(monkeypatch, dtype):
+    monkeypatch.setattr(p, "VECTORS_DTYPE", dtype)
+    docs = make_docs(20)
+    p.save_store(docs, "v.npy", "m.jsonl")
+    meta, matrix = p.load_store("v.npy", "m.jsonl", mmap=False)
+    existing = {d["id"]: {**d, "embedding": row} for d, row in zip(meta, matrix)}
+
+    # un document reindexat, unul nou, unul șters, unul doar cu metadatele reîmprospătate
+    reindexed = {"id": "id3", "name": "doc3.pdf", "text": "nou", "embedding": make_docs(1, seed=1)[0]["embedding"]}
+    added = {"id": "id99", "name": "doc99.pdf", "text": "nou", "embedding": make_docs(1, seed=2)[0]["embedding"]}
+    renamed = {**existing.pop("id5"), "name": "renamed.pdf"}
+    del existing["id7"]
+    existing.pop("id3")
+    existing.update({"id3": reindexed, "id99": added, "id5": renamed})
+    p.append_store(list(existing.values()), [reindexed, added, renamed], "v.npy", "m.jsonl", deleted_ids=["id7"])
+
+    meta, matrix = p.load_store("v.npy", "m.jsonl")
+    expected = {d["id"]: d["embedding"] for d in docs if d["id"] != "id7"}
+    expected.update({"id3": reindexed["embedding"], "id99": added["embedding"]})
+    assert_vectors(meta, matrix, expected)
+    assert {d["id"]: d["name"] for d in meta}["id5"] == "renamed.pdf"
+    assert np.load("v.npy").shape[0] == 22  # rândurile noi adăugate pe loc, fără rescriere
+    assert p.read_doc_text({"id": "id3"}, "m.jsonl") == "nou"
+    assert p.read_doc_text({"id": "id7"}, "m.jsonl") == ""
+
+
+def test_append_compacts():
+    docs = make_docs(10)
+    p.save_store(docs, "v.npy", "m.jsonl")
+    changed = [{**d, "embedding": make_docs(1, seed=10 + i)[0]["embedding"]} for i, d in enumerate(docs[:3])]
+    records = docs[3:] + changed
+    p.append_store(records, changed, "v.npy", "m.jsonl")
+
+    assert np.load("v.npy").shape[0] == 10
+    with open("m.jsonl", "rb") as f:
+        assert f.read().count(b"\n") == 10
+    meta, matrix = p.load_store("v.npy", "m.jsonl")
+    assert_vectors(meta, matrix, {d["id"]: d["embedding"] for d in records})
+
+
+def test_legacy_meta_migration_then_append():
+    docs = make_docs(20)
+    matrix = np.asarray([d["embedding"] for d in docs], dtype=np.float32)
+    np.save("v.npy", (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float16))
+    with open(p.LEGACY_META_FILE, "wb") as f:
+        f.write(orjson.dumps([{k: v for k, v in d.items() if k != "embedding"} for d in docs]))
+
+    meta, matrix = p.load_store("v.npy", "m.jsonl", mmap=False)
+    assert_vectors(meta, matrix, {d["id"]: d["embedding"] for d in docs})
+
+    existing = {d["id"]: {**d, "embedding": row} for d, row in zip(meta, matrix)}
+    reindexed = {"id": "id0", "name": "doc0.pdf", "text": "nou", "embedding": make_docs(1, seed=1)[0]["embedding"]}
+    existing.pop("id0")
+    existing["id0"] = reindexed
+    p.append_store(list(existing.values()), [reindexed], "v.npy", "m.jsonl")
+
+    meta, matrix = p.load_store("v.npy", "m.jsonl")
+    assert_vectors(meta, matrix, {**{d["id"]: d["embedding"] for d in docs}, "id0": reindexed["embedding"]})